@@ -11,7 +11,9 @@ echo "База данных готова к подключению!"
 
 if [ "$INIT_DB" = "true" ]; then
   if PGPASSWORD="$POSTGRES_PASSWORD" psql -h "$POSTGRES_HOST" -U "$POSTGRES_USER" -d "$POSTGRES_DB" -tAc "SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' LIMIT 1" | grep -q 1; then
-    echo "База данных уже инициализирована, пропускаем создание таблиц."
+    echo "База данных уже инициализирована, применяем изменения схемы."
+    python -m core.database.base
+    python -m core.database.catalog_sql
   else
     echo "Инициализация базы данных..."
     python -m core.database.base
@@ -0,0 +1,419 @@
+"""
+Асинхронный (ASGI) сервер чтения — альтернатива main_app:app на Waitress.
+Отдает те же ответы (/info, /facets, /products, /search, /sync/history, /last_update, /metrics), но работает в одном цикле событий
+поверх asyncpg, поэтому тысячи одновременных соединений не требуют тысяч потоков.
+Синхронизация по-прежнему идет в фоновом потоке APScheduler через синхронный DatabaseHelper.
+
+Запуск (из каталога src, нужны starlette, uvicorn и asyncpg):
+    uvicorn async_app:app --host 0.0.0.0 --port 5555
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import select
+from starlette.applications import Starlette
+from starlette.datastructures import MutableHeaders
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.http import quote_etag
+
+from core.config import settings
+from core.database.async_db_helper import async_db_helper
+from core.database.base import Product, SyncRun
+from core.database.catalog_sql import catalog_query, documents_query
+from core.database.db_helper import db_helper, start_query_tracking, stop_query_tracking
+from core.database.facets import facet_index
+from core.database.search import search_query
+from core.utils.cache import AVAILABLE_ENCODINGS, catalog_cache, product_cache
+from core.utils.filters import ProductFilters, parse_filters
+from core.utils.http import best_encoding, content_etag, etag_matches, generation_etag, parse_bool
+from core.utils.metrics import CONTENT_TYPE, http_request_seconds, registry
+from core.utils.pagination import (
+    encode_cursor, page_envelope, parse_id_cursor, parse_limit, parse_product_cursor, parse_search_cursor,
+)
+from core.utils.projection import Projection, parse_projection
+from core.utils.serialization import dumps
+from core.utils.sync.core.generation import sync_generation
+from core.utils.sync.scheduler import start_scheduler
+from core.utils.sync.utils.logging import sync_log_store
+
+
+def json_response(obj: Any, status_code: int = 200) -> Response:
+    """JSON-ответ в том же виде, что jsonify в main_app"""
+    return Response(dumps(obj) + b"\n", status_code=status_code, media_type="application/json")
+
+
+def not_modified(etag: str, headers: Dict[str, str] = None) -> Response:
+    return Response(status_code=304, headers={"ETag": quote_etag(etag), **(headers or {})})
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    return etag_matches(request.headers.get("if-none-match"), etag)
+
+
+def with_etag(body: bytes, etag: str) -> Response:
+    return Response(body, media_type="application/json", headers={"ETag": quote_etag(etag)})
+
+
+def read_etag_headers(etag: str) -> Dict[str, str]:
+    """ETag поколения для ответа, прочитанного с реплики, не ставится (см. main_app.with_read_etag)"""
+    return {} if async_db_helper.has_replicas else {"ETag": quote_etag(etag)}
+
+
+def with_read_etag(body: bytes, etag: str) -> Response:
+    return Response(body, media_type="application/json", headers=read_etag_headers(etag))
+
+
+async def build_catalog(projection: Projection = Projection(), filters: ProductFilters = ProductFilters(),
+                        session_getter=async_db_helper.read_session_getter) -> bytes:
+    """Асинхронный аналог main_app.build_catalog"""
+    async with session_getter() as session:
+        if settings.api.read_engine == "sql":
+            result = await session.execute(catalog_query(projection.fields, projection.relations, filters))
+            return result.scalar_one().encode()
+
+        query = filters.apply(projection.apply(
+            select(Product)
+            .order_by(Product.product_id)
+        ))
+        products = (await session.scalars(query)).all()
+        return dumps([projection.serialize(product) for product in products])
+
+
+async def stream_catalog(projection: Projection, filters: ProductFilters):
+    """Асинхронный аналог main_app.stream_catalog: пачки через серверный курсор asyncpg"""
+    async with async_db_helper.read_session_getter() as session:
+        yield b"["
+        separator = b""
+        if settings.api.read_engine == "sql":
+            query = documents_query(projection.fields, projection.relations, filters=filters)
+            result = await session.stream(query.execution_options(yield_per=settings.api.stream_batch_size))
+            async for batch in result.partitions():
+                yield separator + ",".join(document for _, document in batch).encode()
+                separator = b","
+            yield b"]"
+            return
+
+        query = filters.apply(projection.apply(
+            select(Product)
+            .order_by(Product.product_id)
+            .execution_options(yield_per=settings.api.stream_batch_size)
+        ))
+        result = await session.stream_scalars(query)
+        async for batch in result.partitions():
+            yield separator + b",".join(dumps(projection.serialize(product)) for product in batch)
+            separator = b","
+        yield b"]"
+
+
+async def catalog_snapshot_response(request: Request, generation: int, etag: str) -> Response:
+    """Полный каталог из снимка поколения, как в main_app"""
+    encoding = best_encoding(request.headers.get("accept-encoding"), AVAILABLE_ENCODINGS)
+    if encoding != "identity":
+        etag = f"{etag}-{encoding}"
+    vary = {"Vary": "Accept-Encoding"}
+    if is_not_modified(request, etag):
+        return not_modified(etag, vary)
+
+    snapshot = await catalog_cache.get_or_build_async(
+        "info", generation, lambda: build_catalog(session_getter=async_db_helper.write_session_getter)
+    )
+    headers = {"ETag": quote_etag(etag), **vary}
+    if encoding == "identity":
+        body = snapshot.body
+    else:
+        # Сжатие (раз в поколение) выполняется вне цикла событий
+        body = await asyncio.to_thread(snapshot.encoded, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def info(request: Request) -> Response:
+    generation = sync_generation.value
+    etag = generation_etag(generation)
+    # С репликами ETag поколения есть только у снимка полного каталога, он проверяется отдельно
+    if not async_db_helper.has_replicas and is_not_modified(request, etag):
+        return not_modified(etag)
+
+    args = request.query_params
+    try:
+        stream = parse_bool(args.get("stream"))
+        projection = parse_projection(args.get("fields"), args.get("include"))
+        filters = parse_filters(args)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    if stream:
+        return StreamingResponse(stream_catalog(projection, filters), media_type="application/json",
+                                 headers=read_etag_headers(etag))
+
+    if "limit" not in args and "cursor" not in args:
+        if projection.is_default and filters.is_empty:
+            return await catalog_snapshot_response(request, generation, etag)
+        return with_read_etag(await build_catalog(projection, filters), etag)
+
+    try:
+        limit = parse_limit(args.get("limit"))
+        after_id = parse_product_cursor(args.get("cursor"))
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    async with async_db_helper.read_session_getter() as session:
+        if settings.api.read_engine == "sql":
+            query = documents_query(projection.fields, projection.relations, after_id, limit + 1, filters=filters)
+            documents = (await session.execute(query)).all()
+            has_more = len(documents) > limit
+            documents = documents[:limit]
+            next_cursor = encode_cursor({"product_id": documents[-1][0]}) if has_more else None
+            body = page_envelope((document.encode() for _, document in documents), next_cursor)
+            return with_read_etag(body, etag)
+
+        query = filters.apply(projection.apply(
+            select(Product)
+            .order_by(Product.product_id)
+            .limit(limit + 1)
+        ))
+        if after_id is not None:
+            query = query.where(Product.product_id > after_id)
+        products = (await session.scalars(query)).all()
+
+        has_more = len(products) > limit
+        products = products[:limit]
+        next_cursor = encode_cursor({"product_id": products[-1].product_id}) if has_more else None
+        items = [projection.serialize(product) for product in products]
+
+    return with_read_etag(dumps({"items": items, "next_cursor": next_cursor}) + b"\n", etag)
+
+
+async def facets(request: Request) -> Response:
+    generation = sync_generation.value
+    etag = generation_etag(generation)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    try:
+        filters = parse_filters(request.query_params)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    # Индекс общий с синхронизацией; первая сборка синхронная, поэтому вне цикла событий
+    index = await asyncio.to_thread(facet_index.get, db_helper.write_session_getter)
+    response = json_response(index.counts(filters))
+    response.headers["ETag"] = quote_etag(etag)
+    return response
+
+
+async def get_product_documents(product_ids: List[int]) -> Dict[int, Tuple[bytes, str]]:
+    """Асинхронный аналог main_app.get_product_documents (общий product_cache)"""
+    documents = {}
+    missing = []
+    for product_id in product_ids:
+        entry = product_cache.get(product_id)
+        if entry is None:
+            missing.append(product_id)
+        else:
+            documents[product_id] = entry
+    if not missing:
+        return documents
+
+    version = product_cache.version
+    async with async_db_helper.write_session_getter() as session:
+        if settings.api.read_engine == "sql":
+            result = await session.execute(documents_query(product_ids=missing))
+            loaded = [(product_id, document.encode()) for product_id, document in result]
+        else:
+            query = Projection().apply(select(Product).where(Product.product_id.in_(missing)))
+            loaded = [(product.product_id, dumps(product.to_dict())) for product in await session.scalars(query)]
+
+    for product_id, body in loaded:
+        entry = (body, content_etag(body))
+        product_cache.put(product_id, entry, version)
+        documents[product_id] = entry
+    return documents
+
+
+async def product(request: Request) -> Response:
+    product_id = request.path_params["product_id"]
+    entry = (await get_product_documents([product_id])).get(product_id)
+    if entry is None:
+        return json_response({"error": f"Product #{product_id} not found"}, 404)
+
+    body, etag = entry
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return with_etag(body, etag)
+
+
+async def products(request: Request) -> Response:
+    try:
+        product_ids = [int(value) for value in request.query_params.get("ids", "").split(",") if value.strip()]
+    except ValueError:
+        return json_response({"error": "Параметр ids должен быть списком целых чисел через запятую"}, 400)
+    if not product_ids:
+        return json_response({"error": "Не передан параметр ids"}, 400)
+    if len(product_ids) > settings.api.max_page_size:
+        return json_response({"error": f"Можно запросить не более {settings.api.max_page_size} продуктов"}, 400)
+
+    product_ids = list(dict.fromkeys(product_ids))
+    documents = await get_product_documents(product_ids)
+    found = [documents[product_id] for product_id in product_ids if product_id in documents]
+    etag = content_etag("".join(etag for _, etag in found).encode())
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return with_etag(b"[" + b",".join(body for body, _ in found) + b"]", etag)
+
+
+async def search(request: Request) -> Response:
+    q = request.query_params.get("q", "").strip()
+    if not q:
+        return json_response({"error": "Не передан параметр q"}, 400)
+    try:
+        limit = parse_limit(request.query_params.get("limit"))
+        after = parse_search_cursor(request.query_params.get("cursor"))
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    async with async_db_helper.read_session_getter() as session:
+        hits = (await session.execute(search_query(q, limit + 1, after))).all()
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+    next_cursor = encode_cursor({"rank": hits[-1][1], "product_id": hits[-1][0]}) if has_more else None
+
+    documents = await get_product_documents([product_id for product_id, _ in hits])
+    items = (documents[product_id][0] for product_id, _ in hits if product_id in documents)
+    return Response(page_envelope(items, next_cursor), media_type="application/json")
+
+
+async def sync_history(request: Request) -> Response:
+    try:
+        limit = parse_limit(request.query_params.get("limit"))
+        before_id = parse_id_cursor(request.query_params.get("cursor"), "id")
+        on_main = parse_bool(request.query_params.get("on_main"))
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    query = select(SyncRun).order_by(SyncRun.id.desc()).limit(limit + 1)
+    if before_id is not None:
+        query = query.where(SyncRun.id < before_id)
+    if on_main is not None:
+        query = query.where(SyncRun.on_main == on_main)
+
+    async with async_db_helper.read_session_getter() as session:
+        runs = (await session.scalars(query)).all()
+    has_more = len(runs) > limit
+    runs = runs[:limit]
+    return json_response({
+        "items": [run.to_dict() for run in runs],
+        "next_cursor": encode_cursor({"id": runs[-1].id}) if has_more else None
+    })
+
+
+def read_log(log_path: str) -> str:
+    with open(log_path, 'r') as f:
+        return f.read()
+
+
+async def last_update(request: Request) -> Response:
+    try:
+        # Указатель на последний лог: время ответа не зависит от числа запусков синхронизации
+        latest = await asyncio.to_thread(sync_log_store.latest)
+        if latest is None:
+            return json_response({"error": "No sync logs found"}, 404)
+
+        log_path, latest_log, etag = latest
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+
+        log_content = await asyncio.to_thread(read_log, log_path)
+
+        response = json_response({
+            "log_file": latest_log,
+            "timestamp": latest_log[5:20],
+            "content": log_content
+        })
+        response.headers["ETag"] = quote_etag(etag)
+        return response
+
+    except Exception as e:
+        return json_response({"error": f"Failed to read logs: {str(e)}"}, 500)
+
+
+async def metrics(request: Request) -> Response:
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware гистограммы http_request_duration_seconds и заголовков X-DB-Queries/X-DB-Time-Ms.
+    Как и в main_app, время и запросы считаются до начала ответа, без передачи потокового тела.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        query_stats = start_query_tracking()
+        recorded = False
+
+        def record(status: int):
+            nonlocal recorded
+            recorded = True
+            # Router кладет найденный маршрут в scope: метка — шаблон пути, а не сам путь
+            route = scope.get("route")
+            http_request_seconds.observe(time.perf_counter() - started, getattr(route, "path", "unmatched"),
+                                         scope["method"], str(status))
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                record(message["status"])
+                if settings.api.debug_headers:
+                    headers = MutableHeaders(scope=message)
+                    headers["X-DB-Queries"] = str(query_stats.count)
+                    headers["X-DB-Time-Ms"] = f"{query_stats.seconds * 1000:.2f}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            stop_query_tracking(query_stats)
+            if not recorded:
+                record(500)
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    scheduler = start_scheduler()
+    registry.register_pool("primary", async_db_helper.engine.sync_engine.pool)
+    for number, replica_engine in enumerate(async_db_helper.replica_engines):
+        registry.register_pool(f"replica_{number}", replica_engine.sync_engine.pool)
+    # Синхронный пул используется фоновой синхронизацией
+    registry.register_pool("sync", db_helper.engine.pool)
+    try:
+        yield
+    finally:
+        scheduler.shutdown(wait=False)
+        await async_db_helper.dispose()
+
+
+app = Starlette(
+    routes=[
+        Route("/info", info),
+        Route("/facets", facets),
+        Route("/products/{product_id:int}", product),
+        Route("/products", products),
+        Route("/search", search),
+        Route("/sync/history", sync_history),
+        Route("/last_update", last_update),
+        Route("/metrics", metrics),
+    ],
+    middleware=[Middleware(MetricsMiddleware)],
+    lifespan=lifespan,
+)
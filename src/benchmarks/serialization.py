@@ -0,0 +1,81 @@
+"""
+Микробенчмарк сериализаторов JSON на синтетическом каталоге.
+
+Запуск (из каталога src):
+    python -m benchmarks.serialization --products 10000 --repeat 5
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from core.utils.serialization import OrjsonSerializer, StdlibSerializer, orjson
+
+
+def build_catalog(size: int) -> list:
+    """Каталог в том же виде, что отдает Product.to_dict()"""
+    created_at = datetime(2024, 1, 1, 10, 0, 0)
+    catalog = []
+    for product_id in range(1, size + 1):
+        catalog.append({
+            "product_id": product_id,
+            "product_name": f"Смартфон модель {product_id}",
+            "on_main": product_id % 2 == 0,
+            "created_at": created_at + timedelta(minutes=product_id),
+            "updated_at": created_at + timedelta(hours=product_id, microseconds=product_id),
+            "moysklad_connector_products_data": None,
+            "tags": ["новинка", f"tag{product_id % 7}"],
+            "categories": [{"category_id": product_id % 20, "category_name": "Телефоны",
+                            "category_image": "https://example.com/images/categories/phones.png", "sort_order": 1}],
+            "colors": [{"color_id": product_id * 10 + i, "color_name": f"Цвет {i}", "color_code": "#ffffff",
+                        "color_image": None, "discount": 5.0, "json_data": {"hex": "#fff"}, "sort_order": i}
+                       for i in range(3)],
+            "marks": [{"mark_id": 1, "mark_name": "Хит"}],
+            "parameters": [{"parameter_id": product_id * 10 + i, "name": f"{64 * (i + 1)} ГБ",
+                            "parameter_string": "Память", "price": 19990.0 + i * 5000, "old_price": None,
+                            "chosen": i == 0, "disabled": False, "extra_field_color": None,
+                            "extra_field_image": None, "sort_order": i}
+                           for i in range(3)],
+            "images": [{"image_id": product_id * 10 + i, "image_url": f"https://example.com/images/{product_id}/{i}.jpg",
+                        "main_image": i == 0, "position": None, "sort_order": i, "title": None}
+                       for i in range(4)],
+            "extras": [{"product_extra_id": product_id, "characteristics": "Экран 6.1\", 128 ГБ", "delivery": None,
+                        "kit": None, "offer": None, "ai_description": "Описание " * 20}],
+            "reviews": [],
+            "videos": [],
+        })
+    return catalog
+
+
+def measure(serializer, catalog: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        serializer.dumps(catalog)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.products)
+    serializers = [StdlibSerializer()]
+    if orjson is not None:
+        serializers.append(OrjsonSerializer())
+    else:
+        print("orjson не установлен, сравнение только со стандартным json")
+
+    baseline = None
+    for serializer in serializers:
+        seconds = measure(serializer, catalog, args.repeat)
+        size = len(serializer.dumps(catalog))
+        baseline = baseline or seconds
+        print(f"{serializer.name:>7}: {seconds * 1000:8.1f} ms, {size / 1024 / 1024:.1f} MiB, "
+              f"x{baseline / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
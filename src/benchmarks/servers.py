@@ -0,0 +1,107 @@
+"""
+Нагрузочное сравнение серверов чтения: main_app на Waitress против async_app на Uvicorn.
+Каждое виртуальное соединение держит keep-alive и шлет запросы друг за другом,
+поэтому уровень конкурентности равен числу открытых соединений.
+
+Запуск (из каталога src, оба сервера уже подняты на одной БД):
+    waitress-serve --port=5555 --threads=50 main_app:app
+    uvicorn async_app:app --port 8080
+    python -m benchmarks.servers \\
+        --url http://127.0.0.1:5555/info?limit=100 --url http://127.0.0.1:8080/info?limit=100 \\
+        --concurrency 50 200 1000 --duration 10
+
+Для 1000 соединений может понадобиться поднять лимит дескрипторов (ulimit -n 4096).
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+
+async def _read_response(reader: asyncio.StreamReader) -> int:
+    """Читает один ответ HTTP/1.1 целиком и возвращает его статус"""
+    status_line = await reader.readuntil(b"\r\n")
+    status = int(status_line.split(b" ", 2)[1])
+    length: Optional[int] = None
+    chunked = False
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        if line == b"\r\n":
+            break
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            length = int(value)
+        elif name == b"transfer-encoding" and b"chunked" in value.lower():
+            chunked = True
+
+    if chunked:
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status
+
+
+async def _worker(url: str, deadline: float, latencies: List[float], errors: List[int]):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    request = (f"GET {path or '/'} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+               f"Accept-Encoding: identity\r\nConnection: keep-alive\r\n\r\n").encode()
+    writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            started = time.perf_counter()
+            writer.write(request)
+            status = await _read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append(status)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            errors.append(0)
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def run(url: str, concurrency: int, duration: float) -> str:
+    latencies: List[float] = []
+    errors: List[int] = []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker(url, deadline, latencies, errors) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return (f"{url:<50} c={concurrency:<5} {len(latencies) / elapsed:>9.1f} req/s  "
+            f"p50={_percentile(latencies, 50) * 1000:>8.1f} ms  p99={_percentile(latencies, 99) * 1000:>8.1f} ms  "
+            f"errors={len(errors)}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", action="append", required=True, help="URL для нагрузки (можно несколько)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность каждого прогона, сек")
+    args = parser.parse_args()
+
+    for concurrency in args.concurrency:
+        for url in args.url:
+            print(await run(url, concurrency, args.duration), flush=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel
 from pydantic import PostgresDsn
 from pydantic_settings import (
@@ -9,6 +11,8 @@ from pydantic_settings import (
 
 class DatabaseConfig(BaseModel):
     url: PostgresDsn = ""
+    # Реплики для чтения (APP_CONFIG__DB__REPLICA_URLS='["postgresql+psycopg2://..."]')
+    replica_urls: list[PostgresDsn] = []
     echo: bool = False
     echo_pool: bool = False
     pool_size: int = 50
@@ -23,6 +27,49 @@ class DatabaseConfig(BaseModel):
     }
 
 
+class LogConfig(BaseModel):
+    # Каталог логов синхронизации; хранятся только последние retention запусков
+    dir: str = "logs"
+    retention: int = 200
+
+
+class ProfilingConfig(BaseModel):
+    # Профилирование запросов по заголовку X-Profile или ?profile=<token>; без токена недоступно
+    enabled: bool = False
+    token: str = ""
+    top: int = 30
+    dir: str = "profiles"
+
+
+class SyncConfig(BaseModel):
+    # Периодическая синхронизация в процессе сервера; при нескольких серверах на одной БД включается в одном
+    scheduler: bool = True
+    # Как часто сервер сверяет поколение каталога с БД, чтобы заметить синхронизацию другого процесса
+    generation_check_ms: int = 1000
+    # Потоковый разбор ответа API (если установлен ijson): продукты передаются в sync_products пачками
+    stream: bool = True
+    batch_size: int = 500
+    # Ответ API держится в памяти до spool_bytes байт, дальше пишется во временный файл
+    spool_bytes: int = 1024 ** 2
+
+
+class ApiConfig(BaseModel):
+    page_size: int = 100
+    max_page_size: int = 1000
+    stream_batch_size: int = 500
+    product_cache_size: int = 10000
+    # Уровни сжатия закэшированных снимков каталога
+    gzip_level: int = 6
+    brotli_quality: int = 5
+    # orm - сериализация через модели, sql - сборка JSON на стороне PostgreSQL
+    read_engine: Literal["orm", "sql"] = "orm"
+    # Заголовки X-DB-Queries и X-DB-Time-Ms с числом и временем SQL-запросов, выполненных запросом API;
+    # раскрывают детали работы с БД, поэтому, как и профилирование, по умолчанию выключены
+    debug_headers: bool = False
+    # Границы ценовых корзин /facets: [0, 1000), [1000, 5000), ..., [100000, +inf)
+    facet_price_buckets: list[float] = [1000, 5000, 10000, 50000, 100000]
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -35,6 +82,10 @@ class Settings(BaseSettings):
     time_sleep: int = 30
     url: str = "https://bot-igor.ru/api/products"
     db: DatabaseConfig = DatabaseConfig()
+    api: ApiConfig = ApiConfig()
+    log: LogConfig = LogConfig()
+    profiling: ProfilingConfig = ProfilingConfig()
+    sync: SyncConfig = SyncConfig()
 
 settings = Settings()
 
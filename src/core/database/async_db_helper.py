@@ -0,0 +1,77 @@
+import itertools
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Sequence
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from core.config import settings
+from core.database.db_helper import instrument_engine
+from core.utils.serialization import dumps
+
+
+def asyncpg_url(url: str) -> str:
+    """Тот же DSN, но с асинхронным драйвером asyncpg вместо psycopg2"""
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+class AsyncDatabaseHelper:
+    """Асинхронный аналог DatabaseHelper для ASGI-сервера чтения (драйвер asyncpg)"""
+
+    def __init__(self,
+        url: str,
+        replica_urls: Sequence[str] = (),
+        echo: bool = False,
+        echo_pool: bool = False,
+        pool_size: int = 5,
+        max_overflow: int = 10):
+        self._engine_options = dict(
+            echo=echo,
+            echo_pool=echo_pool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            json_serializer=lambda obj: dumps(obj).decode(),
+        )
+        self.engine = create_async_engine(asyncpg_url(url), **self._engine_options)
+        instrument_engine(self.engine.sync_engine)
+        self.SessionLocal = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+
+        self.replica_engines = [create_async_engine(asyncpg_url(replica_url), **self._engine_options)
+                                for replica_url in replica_urls]
+        for engine in self.replica_engines:
+            instrument_engine(engine.sync_engine)
+        self._replica_sessions = ([async_sessionmaker(bind=engine, expire_on_commit=False)
+                                   for engine in self.replica_engines] or [self.SessionLocal])
+        self._replica_counter = itertools.count()
+
+    @asynccontextmanager
+    async def write_session_getter(self) -> AsyncGenerator[AsyncSession, None]:
+        """Сессия основной БД"""
+        async with self.SessionLocal() as session:
+            yield session
+
+    @property
+    def has_replicas(self) -> bool:
+        """read_session_getter читает с реплик, а не из основной БД"""
+        return bool(self.replica_engines)
+
+    @asynccontextmanager
+    async def read_session_getter(self) -> AsyncGenerator[AsyncSession, None]:
+        """Сессия одной из реплик (round-robin); без реплик — основная БД"""
+        session_factory = self._replica_sessions[next(self._replica_counter) % len(self._replica_sessions)]
+        async with session_factory() as session:
+            yield session
+
+    async def dispose(self):
+        await self.engine.dispose()
+        for engine in self.replica_engines:
+            await engine.dispose()
+
+async_db_helper = AsyncDatabaseHelper(
+    url=str(settings.db.url),
+    replica_urls=[str(url) for url in settings.db.replica_urls],
+    echo=settings.db.echo,
+    echo_pool=settings.db.echo_pool,
+    pool_size=settings.db.pool_size,
+    max_overflow=settings.db.max_overflow,
+)
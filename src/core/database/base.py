@@ -1,6 +1,8 @@
 from datetime import datetime
 from typing import Annotated, Optional, List, Any, Dict
-from sqlalchemy import ForeignKey, Text, MetaData, JSON
+from sqlalchemy import ForeignKey, String, Text, MetaData, JSON, Index, cast, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from sqlalchemy.orm import DeclarativeBase
@@ -26,13 +28,15 @@ intpkfk = Annotated[int, mapped_column(ForeignKey('products.product_id', ondelet
 class ProductCategoryAssociation(Base):
     __tablename__ = 'product_category_association'
     product_id: Mapped[int] = mapped_column(ForeignKey('products.product_id', ondelete="CASCADE"), primary_key=True)
-    category_id: Mapped[int] = mapped_column(ForeignKey('categories.category_id', ondelete="CASCADE"), primary_key=True)
+    category_id: Mapped[int] = mapped_column(ForeignKey('categories.category_id', ondelete="CASCADE"), primary_key=True,
+                                             index=True)
 
 
 class ProductMarkAssociation(Base):
     __tablename__ = 'product_mark_association'
     product_id: Mapped[int] = mapped_column(ForeignKey('products.product_id', ondelete="CASCADE"), primary_key=True)
-    mark_id: Mapped[int] = mapped_column(ForeignKey('product_marks.mark_id', ondelete="CASCADE"), primary_key=True)
+    mark_id: Mapped[int] = mapped_column(ForeignKey('product_marks.mark_id', ondelete="CASCADE"), primary_key=True,
+                                         index=True)
 
 
 # Основные модели с методами to_dict()
@@ -86,59 +90,78 @@ class Product(Base):
     __tablename__ = "products"
 
     created_at: Mapped[datetime]
-    on_main: Mapped[bool]
+    on_main: Mapped[bool] = mapped_column(index=True)
     product_id: Mapped[intpk]
     product_name: Mapped[str]
     updated_at: Mapped[datetime]
     moysklad_connector_products_data: Mapped[Optional[str]]
     tags: Mapped[Optional[List[str]]] = mapped_column(JSON)
+    # Взвешенный полнотекстовый индекс, поддерживается синхронизацией (см. core.database.search)
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, deferred=True)
+    # Хэш содержимого продукта из API вместе со связанными списками (см. sync_products)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(32))
 
-    # Отношения
+    # Отношения (упорядочены по ключу, чтобы сериализация была детерминированной)
     categories: Mapped[List["Category"]] = relationship(secondary="product_category_association", cascade="all, delete",
-                                                        lazy="selectin")
-    colors: Mapped[List["ProductColor"]] = relationship(cascade="all, delete-orphan", lazy="selectin")
-    excluded: Mapped[List["ExcludedCombination"]] = relationship(cascade="all, delete-orphan", lazy="selectin")
-    extras: Mapped[List["ProductExtra"]] = relationship(cascade="all, delete-orphan", lazy="selectin")
-    images: Mapped[List["ProductImage"]] = relationship(cascade="all, delete-orphan", lazy="selectin")
-    importance_items: Mapped[List["ImportanceItem"]] = relationship(cascade="all, delete-orphan", lazy="selectin")
+                                                        lazy="selectin", order_by="Category.category_id")
+    colors: Mapped[List["ProductColor"]] = relationship(cascade="all, delete-orphan", lazy="selectin",
+                                                        order_by="ProductColor.color_id")
+    excluded: Mapped[List["ExcludedCombination"]] = relationship(cascade="all, delete-orphan", lazy="selectin",
+                                                                 order_by="ExcludedCombination.id")
+    extras: Mapped[List["ProductExtra"]] = relationship(cascade="all, delete-orphan", lazy="selectin",
+                                                        order_by="ProductExtra.product_extra_id")
+    images: Mapped[List["ProductImage"]] = relationship(cascade="all, delete-orphan", lazy="selectin",
+                                                        order_by="ProductImage.image_id")
+    importance_items: Mapped[List["ImportanceItem"]] = relationship(cascade="all, delete-orphan", lazy="selectin",
+                                                                    order_by="ImportanceItem.id")
     marks: Mapped[List["ProductMark"]] = relationship(secondary="product_mark_association", cascade="all, delete",
-                                                      lazy="selectin")
-    parameters: Mapped[List["ProductParameter"]] = relationship(cascade="all, delete-orphan", lazy="selectin")
-    reviews: Mapped[List["ProductReview"]] = relationship(cascade="all, delete-orphan", lazy="selectin")
-    videos: Mapped[List["ProductVideo"]] = relationship(cascade="all, delete-orphan", lazy="selectin")
-
-    def to_dict(self, include_relations=True):
+                                                      lazy="selectin", order_by="ProductMark.mark_id")
+    parameters: Mapped[List["ProductParameter"]] = relationship(cascade="all, delete-orphan", lazy="selectin",
+                                                                order_by="ProductParameter.parameter_id")
+    reviews: Mapped[List["ProductReview"]] = relationship(cascade="all, delete-orphan", lazy="selectin",
+                                                          order_by="ProductReview.photo_id")
+    videos: Mapped[List["ProductVideo"]] = relationship(cascade="all, delete-orphan", lazy="selectin",
+                                                        order_by="ProductVideo.video_id")
+
+    # Поля и связи, которые попадают в сериализованный продукт
+    SERIALIZED_FIELDS = ("product_id", "product_name", "on_main", "created_at", "updated_at",
+                         "moysklad_connector_products_data", "tags")
+    SERIALIZED_RELATIONS = ("categories", "colors", "marks", "parameters", "images", "extras", "reviews", "videos")
+
+    def to_dict(self, include_relations=True, fields=None, relations=None):
         """
         Преобразует объект продукта в словарь
 
         Args:
             include_relations: Включать ли связанные объекты (по умолчанию True)
+            fields: Какие поля продукта включать (по умолчанию все из SERIALIZED_FIELDS)
+            relations: Какие связи включать (по умолчанию все из SERIALIZED_RELATIONS)
         """
         product_dict = {
             "product_id": self.product_id,
             "product_name": self.product_name,
             "on_main": self.on_main,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
             "moysklad_connector_products_data": self.moysklad_connector_products_data,
             "tags": self.tags
+        } if fields is None else {
+            field: getattr(self, field) for field in fields
         }
 
         if include_relations:
-            product_dict.update({
-                "categories": [category.to_dict() for category in self.categories],
-                "colors": [color.to_dict() for color in self.colors],
-                "marks": [mark.to_dict() for mark in self.marks],
-                "parameters": [parameter.to_dict() for parameter in self.parameters],
-                "images": [image.to_dict() for image in self.images],
-                "extras": [extra.to_dict() for extra in self.extras],
-                "reviews": [review.to_dict() for review in self.reviews],
-                "videos": [video.to_dict() for video in self.videos]
-            })
+            for relation in (self.SERIALIZED_RELATIONS if relations is None else relations):
+                product_dict[relation] = [item.to_dict() for item in getattr(self, relation)]
 
         return product_dict
 
 
+# GIN-индекс по tags для фильтра по тегу (tags @> '["tag"]').
+# Сама колонка остается json, чтобы хранить текст ровно в том виде, в каком его отдает API
+Index("ix_products_tags", cast(Product.tags, JSONB), postgresql_using="gin")
+Index("ix_products_search_vector", Product.search_vector, postgresql_using="gin")
+
+
 class ProductColor(Base):
     __tablename__ = "product_colors"
 
@@ -350,5 +373,37 @@ class ProjectJsonConfig(Base):
     config_type: Mapped[Optional[str]] = mapped_column(unique=True)
     config_data: Mapped[Dict[str, Any]] = mapped_column(JSON)
 
+class SyncRun(Base):
+    """Запуск sync_api_data с метриками для /sync/history"""
+    __tablename__ = 'sync_runs'
+
+    id: Mapped[intpk]
+    on_main: Mapped[bool]
+    started_at: Mapped[datetime]
+    finished_at: Mapped[datetime]
+    status: Mapped[str]  # ok, error (критическая ошибка синхронизации) или not_modified (API ответил 304)
+    changed: Mapped[bool]  # Зафиксированы ли изменения каталога
+    # {секция: {"added": n, "updated": n, "deleted": n, "errors": n}}, счетчики строк по событиям flush
+    sections: Mapped[Dict[str, Any]] = mapped_column(JSON)
+    api_fetch_ms: Mapped[Optional[float]]  # Время запроса к API
+    db_commit_ms: Mapped[float]  # Суммарное время commit за запуск
+    payload_bytes: Mapped[Optional[int]]  # Размер ответа API
+
+
+def upgrade_schema(engine: Engine):
+    """
+    Доводит существующую БД до текущих моделей: create_all создает только недостающие таблицы
+    (например, sync_runs) вместе с их индексами, а колонки и индексы, добавленные в существующие
+    таблицы, создаются здесь
+    """
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE products ADD COLUMN IF NOT EXISTS content_hash varchar(32)"))
+        connection.execute(text("ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+
 if __name__ == "__main__":
-    Base.metadata.create_all(db_helper.engine)
\ No newline at end of file
+    Base.metadata.create_all(db_helper.engine)
+    upgrade_schema(db_helper.engine)
\ No newline at end of file
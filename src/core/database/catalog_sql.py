@@ -0,0 +1,202 @@
+"""
+Сборка JSON-документов продуктов на стороне PostgreSQL.
+
+Документ склеивается в SQL как текст, байт в байт совпадающий с выводом ORM-пути
+(to_dict + компактный JSON с сортировкой ключей): ключи идут в алфавитном порядке,
+float и datetime форматируются так же, как их форматирует Python. Для float совпадение
+гарантируется в диапазоне 1e-4 <= |x| < 1e15, где repr(), orjson и PostgreSQL печатают числа одинаково.
+"""
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import (
+    JSON, BigInteger, Column, DateTime, Float, Select, Text, and_, bindparam, case, cast, func, literal_column,
+    select, update,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+
+from core.database.base import (
+    Category, Product, ProductCategoryAssociation, ProductExtra, ProductImage, ProductMark,
+    ProductMarkAssociation, ProductParameter, ProductReview, ProductVideo, ProductColor,
+)
+from core.utils.serialization import dumps, loads
+
+# Связи продукта: модель, ассоциативная таблица (для многие-ко-многим) и ключ сортировки
+RELATIONS = {
+    "categories": (Category, ProductCategoryAssociation, Category.category_id),
+    "colors": (ProductColor, None, ProductColor.color_id),
+    "marks": (ProductMark, ProductMarkAssociation, ProductMark.mark_id),
+    "parameters": (ProductParameter, None, ProductParameter.parameter_id),
+    "images": (ProductImage, None, ProductImage.image_id),
+    "extras": (ProductExtra, None, ProductExtra.product_extra_id),
+    "reviews": (ProductReview, None, ProductReview.photo_id),
+    "videos": (ProductVideo, None, ProductVideo.video_id),
+}
+
+
+def _sql_text(value: str):
+    return literal_column("'" + value.replace("'", "''") + "'", Text)
+
+
+def _json_value(column: Column):
+    """JSON-представление значения колонки в виде текста"""
+    if isinstance(column.type, Float):
+        # repr() у целых float дает "5.0", а PostgreSQL печатает "5"
+        value = case(
+            (and_(column == func.trunc(column), func.abs(column) < 1e16),
+             func.concat(cast(cast(column, BigInteger), Text), ".0")),
+            else_=cast(column, Text),
+        )
+    elif isinstance(column.type, DateTime):
+        # Как datetime.isoformat(): микросекунды печатаются, только если они ненулевые
+        value = case(
+            (column == func.date_trunc("second", column), func.to_char(column, 'YYYY-MM-DD"T"HH24:MI:SS')),
+            else_=func.to_char(column, 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+        )
+        value = func.to_json(value)
+    elif isinstance(column.type, JSON):
+        # Тип json хранит текст как есть: он пишется тем же сериализатором, что и ответы,
+        # а строки, записанные раньше, приводит к нему normalize_json_columns()
+        value = column
+    else:
+        value = func.to_json(column)
+    return func.coalesce(cast(value, Text), "null")
+
+
+def _object(pairs: Sequence[Tuple[str, object]]):
+    """Склеивает JSON-объект из пар (ключ, текстовое значение) в порядке сортировки ключей"""
+    parts = []
+    for index, (key, value) in enumerate(sorted(pairs, key=lambda pair: pair[0])):
+        parts.append(_sql_text(("{" if index == 0 else ",") + f'"{key}":'))
+        parts.append(value)
+    parts.append(_sql_text("}" if parts else "{}"))
+    return func.concat(*parts)
+
+
+def _array(element, order_key):
+    """Агрегат, склеивающий документы в JSON-массив в порядке order_key"""
+    items = func.string_agg(element, aggregate_order_by(literal_column("','"), order_key))
+    return func.concat("[", func.coalesce(items, ""), "]")
+
+
+def _relation_array(name: str):
+    """Коррелированный подзапрос, собирающий массив дочерних документов продукта"""
+    model, association, order_key = RELATIONS[name]
+    table = model.__table__
+    # Дочерние to_dict() отдают все колонки, кроме внешнего ключа на продукт
+    element = _object([
+        (column.name, _json_value(column)) for column in table.columns
+        if not (association is None and column.name == "product_id")
+    ])
+    query = select(_array(element, order_key))
+    if association is None:
+        query = query.where(table.c.product_id == Product.product_id)
+    else:
+        link_column = next(column for column in association.__table__.columns if column.name != "product_id")
+        query = query.join_from(table, association, link_column == table.c[link_column.name]).where(
+            association.product_id == Product.product_id
+        )
+    return query.scalar_subquery()
+
+
+def product_document(fields: Optional[Sequence[str]] = None, relations: Optional[Sequence[str]] = None):
+    """Выражение, возвращающее JSON-документ продукта под заданную проекцию"""
+    fields = Product.SERIALIZED_FIELDS if fields is None else fields
+    relations = Product.SERIALIZED_RELATIONS if relations is None else relations
+    pairs = [(field, _json_value(Product.__table__.c[field])) for field in fields]
+    pairs += [(relation, _relation_array(relation)) for relation in relations]
+    return _object(pairs)
+
+
+def documents_query(fields=None, relations=None, after_id: Optional[int] = None,
+                    limit: Optional[int] = None, product_ids: Optional[Sequence[int]] = None,
+                    filters=None) -> Select:
+    """
+    Запрос пар (product_id, документ) в порядке product_id
+    Args:
+        filters: Объект с методом apply(query), добавляющим условия отбора продуктов
+    """
+    query = (
+        select(Product.product_id, product_document(fields, relations).label("document"))
+        .order_by(Product.product_id)
+    )
+    if after_id is not None:
+        query = query.where(Product.product_id > after_id)
+    if product_ids is not None:
+        query = query.where(Product.product_id.in_(product_ids))
+    if filters is not None:
+        query = filters.apply(query)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def fetch_documents(session: Session, fields=None, relations=None, after_id: Optional[int] = None,
+                    limit: Optional[int] = None, product_ids: Optional[Sequence[int]] = None,
+                    filters=None) -> List[Tuple[int, str]]:
+    """Документы продуктов страницы или заданного набора ID"""
+    query = documents_query(fields, relations, after_id, limit, product_ids, filters)
+    return list(session.execute(query).tuples())
+
+
+def catalog_query(fields=None, relations=None, filters=None) -> Select:
+    """Запрос всего каталога одним JSON-массивом"""
+    documents = documents_query(fields, relations, filters=filters).subquery()
+    return select(_array(documents.c.document, documents.c.product_id))
+
+
+def fetch_catalog(session: Session, fields=None, relations=None, filters=None) -> bytes:
+    """Весь каталог одним JSON-массивом, собранным в одном запросе"""
+    return session.execute(catalog_query(fields, relations, filters)).scalar_one().encode()
+
+
+def stream_documents(session: Session, batch_size: int, fields=None, relations=None,
+                     filters=None) -> Iterator[List[str]]:
+    """Документы каталога пачками через серверный курсор"""
+    query = documents_query(fields, relations, filters=filters).execution_options(yield_per=batch_size)
+    result = session.execute(query)
+    for batch in result.partitions():
+        yield [document for _, document in batch]
+
+
+def normalize_json_columns(session: Session, batch_size: int = 1000) -> int:
+    """
+    Перезаписывает JSON-колонки документов продуктов текстом текущего сериализатора.
+    Нужна для строк, записанных до его появления (json.dumps с пробелами и \\uXXXX),
+    иначе движок sql отдает их не так, как orm. Возвращает число перезаписанных значений.
+    """
+    models = [Product] + [model for model, _, _ in RELATIONS.values()]
+    rewritten = 0
+    for table in dict.fromkeys(model.__table__ for model in models):
+        keys = list(table.primary_key.columns)
+        for column in table.columns:
+            if not isinstance(column.type, JSON):
+                continue
+            statement = (
+                update(table).where(*(key == bindparam(f"key_{key.name}") for key in keys))
+                .values({column.name: cast(bindparam("text", type_=Text), column.type)})
+            )
+            rows = session.execute(
+                select(cast(column, Text), *keys).where(column.is_not(None))
+                .execution_options(yield_per=batch_size)
+            )
+            for batch in rows.partitions():
+                changed = []
+                for text, *row_key in batch:
+                    normalized = dumps(loads(text)).decode()
+                    if normalized != text:
+                        params = {f"key_{key.name}": value for key, value in zip(keys, row_key)}
+                        changed.append({**params, "text": normalized})
+                if changed:
+                    session.execute(statement, changed)
+                    rewritten += len(changed)
+    return rewritten
+
+
+if __name__ == "__main__":
+    from core.database.db_helper import db_helper
+
+    with db_helper.session_getter() as session:
+        count = normalize_json_columns(session)
+        session.commit()
+        print(f"JSON-колонки приведены к сериализатору ответов: {count} значений")
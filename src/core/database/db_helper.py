@@ -1,38 +1,124 @@
-from typing import Generator
+import itertools
+import time
+from contextvars import ContextVar
+from typing import Generator, Sequence, Tuple
 from contextlib import contextmanager
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
 
 from core.config import settings
+from core.utils.serialization import dumps
+
+
+class QueryStats:
+    """Число SQL-запросов и суммарное время их выполнения"""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# Активные счетчики текущего контекста: потока или asyncio-задачи (SQLAlchemy выполняет запросы
+# AsyncEngine в контексте вызвавшей задачи). Вложенные (запуск синхронизации и ее секция) считают
+# одни и те же запросы. Кортеж неизменяем, чтобы задачи, унаследовавшие контекст, не делили один список
+_active_stats: ContextVar[Tuple[QueryStats, ...]] = ContextVar("active_query_stats", default=())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время старта хранится в контексте выполнения: при ошибке запроса он просто отбрасывается
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    for stats in _active_stats.get():
+        stats.count += 1
+        stats.seconds += elapsed
+
+
+def instrument_engine(engine: Engine):
+    """Подключает к движку подсчет запросов track_queries (для AsyncEngine передается его sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def start_query_tracking() -> QueryStats:
+    """Начинает подсчет запросов текущего потока или asyncio-задачи (например, в before_request)"""
+    stats = QueryStats()
+    _active_stats.set((*_active_stats.get(), stats))
+    return stats
+
+
+def stop_query_tracking(stats: QueryStats):
+    _active_stats.set(tuple(active for active in _active_stats.get() if active is not stats))
+
+
+@contextmanager
+def track_queries() -> Generator[QueryStats, None, None]:
+    """Считает запросы, выполненные текущим потоком или asyncio-задачей внутри блока"""
+    stats = start_query_tracking()
+    try:
+        yield stats
+    finally:
+        stop_query_tracking(stats)
 
 
 class DatabaseHelper:
     def __init__( self,
         url: str,
+        replica_urls: Sequence[str] = (),
         echo: bool = False,
         echo_pool: bool = False,
         pool_size: int = 5,
         max_overflow: int = 10):
-        self.engine = create_engine(
-            url=url,
+        self._engine_options = dict(
             echo=echo,
             echo_pool=echo_pool,
             pool_size=pool_size,
             max_overflow=max_overflow,
+            # JSON-колонки пишутся в том же каноническом виде, в каком их отдает API
+            json_serializer=lambda obj: dumps(obj).decode(),
         )
+        self.engine = create_engine(url=url, **self._engine_options)
+        instrument_engine(self.engine)
         self.SessionLocal = sessionmaker(bind=self.engine)
 
+        # Реплики только для чтения; без них чтение идет в основную БД
+        self.replica_engines = [create_engine(url=replica_url, **self._engine_options) for replica_url in replica_urls]
+        for engine in self.replica_engines:
+            instrument_engine(engine)
+        self._replica_sessions = [sessionmaker(bind=engine) for engine in self.replica_engines] or [self.SessionLocal]
+        self._replica_counter = itertools.count()
+
     @contextmanager
-    def session_getter(self) -> Generator[Session, None, None]:
+    def write_session_getter(self) -> Generator[Session, None, None]:
+        """Сессия основной БД: запись и чтение, которое должно видеть последние коммиты"""
         with self.SessionLocal() as session:
             yield session
 
+    session_getter = write_session_getter
+
+    @property
+    def has_replicas(self) -> bool:
+        """read_session_getter читает с реплик, а не из основной БД"""
+        return bool(self.replica_engines)
+
+    @contextmanager
+    def read_session_getter(self) -> Generator[Session, None, None]:
+        """Сессия одной из реплик (round-robin); данные могут немного отставать от основной БД"""
+        session_factory = self._replica_sessions[next(self._replica_counter) % len(self._replica_sessions)]
+        with session_factory() as session:
+            yield session
+
 db_helper = DatabaseHelper(
     url=str(settings.db.url),
+    replica_urls=[str(url) for url in settings.db.replica_urls],
     echo=settings.db.echo,
     echo_pool=settings.db.echo_pool,
     pool_size=settings.db.pool_size,
     max_overflow=settings.db.max_overflow,
 )
-
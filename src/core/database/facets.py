@@ -0,0 +1,166 @@
+"""
+Фасеты каталога: число продуктов по категориям, меткам и ценовым корзинам.
+
+Индекс строится целиком в памяти процесса после синхронизации: для каждого значения фасета
+хранится битовая маска продуктов (int, бит = позиция продукта). Запрос к /facets пересекает маски
+фильтров и считает единичные биты, не обращаясь к БД. Ответ без фильтров считается при построении
+снимка, а ответы на остальные наборы фильтров запоминаются в снимке после первого запроса.
+"""
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database.base import (
+    Category, Product, ProductCategoryAssociation, ProductMark, ProductMarkAssociation, ProductParameter,
+)
+from core.utils.sync.core.generation import sync_generation
+
+
+class FacetSnapshot:
+    """Неизменяемый снимок индекса фасетов"""
+
+    # Сколько ответов на разные наборы фильтров запоминается в снимке
+    CACHE_SIZE = 1024
+
+    def __init__(self, boundaries: Sequence[float]):
+        self.boundaries = tuple(boundaries)
+        self.all = 0
+        self.on_main: Dict[bool, int] = {True: 0, False: 0}
+        self.tags: Dict[str, int] = defaultdict(int)
+        # id -> (название, маска) в порядке вывода
+        self.categories: Dict[int, Tuple[str, int]] = {}
+        self.marks: Dict[int, Tuple[str, int]] = {}
+        # Продукт попадает в корзину по минимальной цене своих параметров
+        self.price_buckets: List[int] = [0] * (len(self.boundaries) + 1)
+        # Ответы counts() по ключу фильтров; снимок не меняется, поэтому ответы не устаревают
+        self._counts: Dict[tuple, dict] = {}
+
+    def mask(self, filters) -> int:
+        """Маска продуктов, проходящих фильтры ProductFilters"""
+        mask = self.all
+        if filters.category_id is not None:
+            mask &= self.categories.get(filters.category_id, (None, 0))[1]
+        if filters.mark_id is not None:
+            mask &= self.marks.get(filters.mark_id, (None, 0))[1]
+        if filters.on_main is not None:
+            mask &= self.on_main[filters.on_main]
+        if filters.tag is not None:
+            mask &= self.tags.get(filters.tag, 0)
+        return mask
+
+    def counts(self, filters) -> dict:
+        """Значения фасетов для продуктов, проходящих фильтры; значения с нулевым числом опускаются"""
+        key = (filters.category_id, filters.mark_id, filters.on_main, filters.tag)
+        result = self._counts.get(key)
+        if result is None:
+            result = self._count(self.mask(filters))
+            if len(self._counts) < self.CACHE_SIZE:
+                self._counts[key] = result
+        return result
+
+    def _count(self, mask: int) -> dict:
+        categories = [{"category_id": category_id, "category_name": name, "count": count}
+                      for category_id, (name, bits) in self.categories.items()
+                      if (count := (bits & mask).bit_count())]
+        marks = [{"mark_id": mark_id, "mark_name": name, "count": count}
+                 for mark_id, (name, bits) in self.marks.items() if (count := (bits & mask).bit_count())]
+        edges = (None, *self.boundaries, None)
+        price_buckets = [{"min": edges[i], "max": edges[i + 1], "count": count}
+                         for i, bits in enumerate(self.price_buckets) if (count := (bits & mask).bit_count())]
+        return {
+            "total": mask.bit_count(),
+            "categories": categories,
+            "marks": marks,
+            "price_buckets": price_buckets,
+        }
+
+
+def build_facets(session: Session, boundaries: Optional[Sequence[float]] = None) -> FacetSnapshot:
+    """Строит снимок индекса несколькими агрегирующими запросами"""
+    snapshot = FacetSnapshot(settings.api.facet_price_buckets if boundaries is None else sorted(boundaries))
+
+    positions: Dict[int, int] = {}
+    for position, (product_id, on_main, tags) in enumerate(
+            session.execute(select(Product.product_id, Product.on_main, Product.tags).order_by(Product.product_id))):
+        bit = 1 << position
+        positions[product_id] = bit
+        snapshot.all |= bit
+        snapshot.on_main[bool(on_main)] |= bit
+        # Фильтр ?tag= ищет тег в JSON-массиве, поэтому теги в другом виде (например, строкой) не учитываются
+        for tag in tags if isinstance(tags, list) else ():
+            if isinstance(tag, str):
+                snapshot.tags[tag] |= bit
+    snapshot.tags = dict(snapshot.tags)
+
+    category_bits: Dict[int, int] = defaultdict(int)
+    for product_id, category_id in session.execute(
+            select(ProductCategoryAssociation.product_id, ProductCategoryAssociation.category_id)):
+        category_bits[category_id] |= positions.get(product_id, 0)
+    snapshot.categories = {
+        category_id: (name, category_bits.get(category_id, 0))
+        for category_id, name in session.execute(
+            select(Category.category_id, Category.category_name).order_by(Category.sort_order, Category.category_id))
+    }
+
+    mark_bits: Dict[int, int] = defaultdict(int)
+    for product_id, mark_id in session.execute(
+            select(ProductMarkAssociation.product_id, ProductMarkAssociation.mark_id)):
+        mark_bits[mark_id] |= positions.get(product_id, 0)
+    snapshot.marks = {
+        mark_id: (name, mark_bits.get(mark_id, 0))
+        for mark_id, name in session.execute(select(ProductMark.mark_id, ProductMark.mark_name).order_by(ProductMark.mark_id))
+    }
+
+    min_prices = select(ProductParameter.product_id, func.min(ProductParameter.price)).group_by(ProductParameter.product_id)
+    for product_id, price in session.execute(min_prices):
+        if price is not None:
+            snapshot.price_buckets[bisect_right(snapshot.boundaries, price)] |= positions.get(product_id, 0)
+
+    # Ответ без фильтров запрашивается чаще всего: он считается сразу при построении
+    snapshot._counts[(None, None, None, None)] = snapshot._count(snapshot.all)
+    return snapshot
+
+
+class FacetIndex:
+    """Текущий снимок фасетов; подменяется целиком, поэтому читатели не блокируются"""
+
+    def __init__(self):
+        self._snapshot: Optional[FacetSnapshot] = None
+        self._lock = threading.Lock()
+
+    def refresh(self, session: Session):
+        """Перестраивает индекс по текущему состоянию БД (вызывается в конце sync_api_data)"""
+        snapshot = build_facets(session)
+        with self._lock:
+            self._snapshot = snapshot
+
+    def invalidate(self):
+        """Сбрасывает снимок; следующий get() построит его заново"""
+        with self._lock:
+            self._snapshot = None
+
+    def get(self, session_getter: Callable) -> FacetSnapshot:
+        """Текущий снимок; до первой синхронизации процесса строится по запросу один раз"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                with session_getter() as session:
+                    self._snapshot = build_facets(session)
+            return self._snapshot
+
+
+def invalidate_facets(changes):
+    """Индекс перестраивается в sync_api_data; сбрасывать его нужно только после синхронизации другого процесса"""
+    if changes.is_external:
+        facet_index.invalidate()
+
+
+facet_index = FacetIndex()
+sync_generation.subscribe(invalidate_facets)
@@ -0,0 +1,121 @@
+"""
+Полнотекстовый поиск по продуктам.
+
+products.search_vector хранит взвешенный tsvector (русская и английская конфигурации):
+    A - название продукта
+    B - названия параметров
+    C - characteristics, offer и ai_description из product_extras
+Синхронизация пересчитывает его только для продуктов, у которых изменился текст.
+Для существующей БД: python -m core.database.search добавляет колонку и GIN-индекс, если их нет,
+и заполняет search_vector для всех продуктов.
+"""
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import REAL, Select, and_, cast, func, literal_column, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from core.database.base import Product, ProductExtra, ProductParameter
+
+SEARCH_CONFIGS = ("russian", "english")
+
+# Текстовые поля, изменение которых требует пересчета search_vector
+SEARCH_TEXT_ATTRIBUTES = {
+    Product: ("product_name",),
+    ProductParameter: ("name",),
+    ProductExtra: ("characteristics", "offer", "ai_description"),
+}
+
+
+def _weighted(text, weight: str):
+    text = func.coalesce(text, "")
+    vectors = [func.setweight(func.to_tsvector(literal_column(f"'{config}'"), text), weight)
+               for config in SEARCH_CONFIGS]
+    result = vectors[0]
+    for vector in vectors[1:]:
+        result = result.op("||")(vector)
+    return result
+
+
+def search_vector_expression():
+    """Выражение tsvector для строки products"""
+    parameter_names = (
+        select(func.string_agg(ProductParameter.name, " "))
+        .where(ProductParameter.product_id == Product.product_id)
+        .scalar_subquery()
+    )
+    extras_text = (
+        select(func.string_agg(
+            func.concat_ws(" ", ProductExtra.characteristics, ProductExtra.offer, ProductExtra.ai_description), " "
+        ))
+        .where(ProductExtra.product_id == Product.product_id)
+        .scalar_subquery()
+    )
+    return (
+        _weighted(Product.product_name, "A")
+        .op("||")(_weighted(parameter_names, "B"))
+        .op("||")(_weighted(extras_text, "C"))
+    )
+
+
+def ensure_search_schema(session: Session):
+    """Колонка products.search_vector и ее GIN-индекс в БД, созданной до появления поиска"""
+    session.execute(text("ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+    index = next(index for index in Product.__table__.indexes if index.name == "ix_products_search_vector")
+    index.create(session.connection(), checkfirst=True)
+
+
+def refresh_search_vectors(session: Session, product_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Пересчитывает search_vector (без commit)
+    Args:
+        product_ids: Продукты для пересчета; None - все продукты
+    Returns:
+        Количество обновленных строк
+    """
+    statement = update(Product).values(search_vector=search_vector_expression())
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return 0
+        statement = statement.where(Product.product_id.in_(product_ids))
+    return session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+
+def search_query(q: str, limit: int, after: Optional[Tuple[float, int]] = None) -> Select:
+    """
+    Запрос (product_id, rank) по убыванию релевантности
+    Args:
+        after: Позиция keyset-пагинации (rank, product_id) последнего результата предыдущей страницы
+    """
+    tsquery = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIGS[0]}'"), q)
+    for config in SEARCH_CONFIGS[1:]:
+        tsquery = tsquery.op("||")(func.websearch_to_tsquery(literal_column(f"'{config}'"), q))
+    rank = func.ts_rank(Product.search_vector, tsquery)
+
+    query = (
+        select(Product.product_id, rank.label("rank"))
+        .where(Product.search_vector.op("@@")(tsquery))
+        .order_by(rank.desc(), Product.product_id)
+        .limit(limit)
+    )
+    if after is not None:
+        # ts_rank возвращает real: сравниваем в той же точности, иначе равные ранги не совпадут
+        after_rank, after_id = after
+        after_rank = cast(after_rank, REAL)
+        query = query.where(or_(rank < after_rank, and_(rank == after_rank, Product.product_id > after_id)))
+    return query
+
+
+def search_products(session: Session, q: str, limit: int,
+                    after: Optional[Tuple[float, int]] = None) -> List[Tuple[int, float]]:
+    return list(session.execute(search_query(q, limit, after)).tuples())
+
+
+if __name__ == "__main__":
+    from core.database.db_helper import db_helper
+
+    with db_helper.session_getter() as session:
+        ensure_search_schema(session)
+        updated = refresh_search_vectors(session)
+        session.commit()
+        print(f"search_vector пересчитан для {updated} продуктов")
@@ -0,0 +1,163 @@
+import asyncio
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional
+
+from core.config import settings
+from core.utils.sync.core.generation import sync_generation
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli опционален
+    brotli = None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        # mtime=0: одинаковое тело всегда дает одинаковые байты
+        return gzip.compress(body, compresslevel=settings.api.gzip_level, mtime=0)
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.api.brotli_quality)
+    raise ValueError(f"Неподдерживаемое сжатие: {encoding}")
+
+
+# Поддерживаемые кодировки в порядке предпочтения сервера
+AVAILABLE_ENCODINGS = (("br",) if brotli is not None else ()) + ("gzip", "identity")
+
+
+class Snapshot:
+    """Тело ответа одного поколения вместе с его сжатыми вариантами"""
+
+    def __init__(self, generation: int, body: bytes):
+        self.generation = generation
+        self.body = body
+        self._encoded: Dict[str, bytes] = {"identity": body}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        """Тело в заданной кодировке; каждый вариант сжимается один раз за поколение"""
+        data = self._encoded.get(encoding)
+        if data is not None:
+            return data
+        with self._lock:
+            data = self._encoded.get(encoding)
+            if data is None:
+                data = self._encoded[encoding] = _compress(self.body, encoding)
+            return data
+
+
+class SnapshotCache:
+    """
+    Кэш готовых тел ответов, привязанных к поколению синхронизации.
+    Запись считается актуальной, пока поколение не изменилось.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Snapshot] = {}
+        self._lock = threading.Lock()
+        # Создается лениво внутри цикла событий асинхронного сервера
+        self._async_lock: Optional[asyncio.Lock] = None
+
+    def get_or_build(self, key: Hashable, generation: int, builder: Callable[[], bytes]) -> Snapshot:
+        """
+        Возвращает закэшированный снимок или строит его один раз для текущего поколения
+        Args:
+            key: Ключ снимка
+            generation: Поколение, прочитанное до начала построения
+            builder: Функция, строящая тело ответа
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.generation == generation:
+            return entry
+
+        # Строим под блокировкой, чтобы при всплеске запросов в БД пошел только один поток
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.generation == generation:
+                return entry
+            entry = self._entries[key] = Snapshot(generation, builder())
+            return entry
+
+    async def get_or_build_async(self, key: Hashable, generation: int,
+                                 builder: Callable[[], Awaitable[bytes]]) -> Snapshot:
+        """То же, что get_or_build, для асинхронного сервера: ожидание не блокирует цикл событий"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.generation == generation:
+            return entry
+
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.generation == generation:
+                return entry
+            body = await builder()
+            with self._lock:
+                entry = self._entries[key] = Snapshot(generation, body)
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class LRUCache:
+    """
+    Ограниченный по размеру потокобезопасный LRU-кэш.
+    Версия увеличивается при каждой инвалидации: значение, прочитанное из БД до инвалидации,
+    не попадет в кэш, если при put передать версию, полученную до чтения.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any, version: int):
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, keys: Iterable[Hashable]):
+        with self._lock:
+            self._version += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def invalidate_product_cache(changes):
+    """Точечная инвалидация документов продуктов, затронутых синхронизацией"""
+    if changes.shared_changed:
+        product_cache.clear()
+    else:
+        product_cache.evict(changes.product_ids)
+
+
+catalog_cache = SnapshotCache()
+product_cache = LRUCache(settings.api.product_cache_size)
+sync_generation.subscribe(invalidate_product_cache)
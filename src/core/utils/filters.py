@@ -0,0 +1,64 @@
+from typing import Optional
+
+from sqlalchemy import Select, cast, select
+from sqlalchemy.dialects.postgresql import JSONB
+
+from core.database.base import Product, ProductCategoryAssociation, ProductMarkAssociation
+from core.utils.http import parse_bool
+
+
+class ProductFilters:
+    """Серверные фильтры списка продуктов (?category_id=, ?mark_id=, ?on_main=, ?tag=)"""
+
+    def __init__(self, category_id: Optional[int] = None, mark_id: Optional[int] = None,
+                 on_main: Optional[bool] = None, tag: Optional[str] = None):
+        self.category_id = category_id
+        self.mark_id = mark_id
+        self.on_main = on_main
+        self.tag = tag
+
+    @property
+    def is_empty(self) -> bool:
+        return self.category_id is None and self.mark_id is None and self.on_main is None and self.tag is None
+
+    def apply(self, query: Select) -> Select:
+        """Добавляет условия к запросу, выбирающему продукты"""
+        if self.category_id is not None:
+            query = query.where(Product.product_id.in_(
+                select(ProductCategoryAssociation.product_id)
+                .where(ProductCategoryAssociation.category_id == self.category_id)
+            ))
+        if self.mark_id is not None:
+            query = query.where(Product.product_id.in_(
+                select(ProductMarkAssociation.product_id)
+                .where(ProductMarkAssociation.mark_id == self.mark_id)
+            ))
+        if self.on_main is not None:
+            query = query.where(Product.on_main == self.on_main)
+        if self.tag is not None:
+            # Выражение совпадает с индексом ix_products_tags
+            query = query.where(cast(Product.tags, JSONB).contains([self.tag]))
+        return query
+
+
+def _parse_int(value: Optional[str], param: str) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Параметр {param} должен быть целым числом, получено: {value}")
+
+
+def parse_filters(args) -> ProductFilters:
+    """
+    Разбирает фильтры из параметров запроса
+    Raises:
+        ValueError: при некорректных значениях
+    """
+    return ProductFilters(
+        category_id=_parse_int(args.get("category_id"), "category_id"),
+        mark_id=_parse_int(args.get("mark_id"), "mark_id"),
+        on_main=parse_bool(args.get("on_main")),
+        tag=args.get("tag") or None,
+    )
@@ -0,0 +1,49 @@
+import hashlib
+import uuid
+from typing import Optional, Sequence
+
+from flask import Response
+from werkzeug.http import parse_accept_header, parse_etags
+
+# Номер поколения сбрасывается при перезапуске процесса, поэтому ETag дополнительно
+# привязан к конкретному запуску, чтобы значения разных процессов не совпадали
+BOOT_ID = uuid.uuid4().hex[:12]
+
+
+def generation_etag(generation: int, *parts) -> str:
+    """Сильный ETag, производный от поколения синхронизации"""
+    return "-".join([BOOT_ID, str(generation), *map(str, parts)])
+
+
+def content_etag(body: bytes) -> str:
+    """Сильный ETag по содержимому ответа"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверяет значение заголовка If-None-Match (слабое сравнение по RFC 9110)"""
+    return parse_etags(if_none_match).contains_weak(etag)
+
+
+def best_encoding(accept_encoding: Optional[str], available: Sequence[str]) -> str:
+    """Выбирает кодировку по значению заголовка Accept-Encoding среди доступных"""
+    return parse_accept_header(accept_encoding).best_match(available, default="identity") or "identity"
+
+
+def not_modified(etag: str) -> Response:
+    """Пустой ответ 304 Not Modified"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def parse_bool(value: Optional[str]) -> Optional[bool]:
+    """Разбирает булев параметр запроса (true/false, 1/0, yes/no)"""
+    if value is None or value == "":
+        return None
+    lowered = value.lower()
+    if lowered in ("true", "1", "yes"):
+        return True
+    if lowered in ("false", "0", "no"):
+        return False
+    raise ValueError(f"Ожидалось булево значение, получено: {value}")
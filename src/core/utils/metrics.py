@@ -0,0 +1,133 @@
+"""
+Метрики в текстовом формате Prometheus (/metrics) без внешних зависимостей.
+
+Запись наблюдения — bisect по границам корзин и инкремент под блокировкой (единицы микросекунд);
+накопительные суммы по корзинам считаются только при выдаче /metrics.
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Границы корзин по умолчанию, секунды
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы корзин для размеров, байты
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами и набором меток"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [число в каждой корзине..., число сверх последней границы, сумма]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labelvalues, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), series):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Значение, снимаемое в момент выдачи /metrics функцией collect"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labelvalues, value in self.collect():
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        # (имя пула, пул SQLAlchemy) для gauge-метрик пулов соединений
+        self._pools = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_pool(self, name: str, pool):
+        """Добавляет пул соединений SQLAlchemy (engine.pool) в метрики db_pool_*"""
+        self._pools.append((name, pool))
+
+    def pool_values(self, method: str):
+        return [((name,), getattr(pool, method)()) for name, pool in self._pools if hasattr(pool, method)]
+
+    def render(self) -> bytes:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode()
+
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("route", "method", "status")))
+db_pool_size = registry.register(Gauge(
+    "db_pool_size", "Размер пула соединений", ("pool",), lambda: registry.pool_values("size")))
+db_pool_checked_out = registry.register(Gauge(
+    "db_pool_checked_out", "Соединения, выданные из пула", ("pool",), lambda: registry.pool_values("checkedout")))
+db_pool_overflow = registry.register(Gauge(
+    "db_pool_overflow", "Соединения сверх pool_size (отрицательное значение — свободные места в пуле)",
+    ("pool",), lambda: registry.pool_values("overflow")))
+sync_section_seconds = registry.register(Histogram(
+    "sync_section_duration_seconds", "Время синхронизации одной секции", ("section",)))
+sync_run_seconds = registry.register(Histogram(
+    "sync_run_duration_seconds", "Время одного запуска sync_api_data", ("on_main", "status"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)))
+api_fetch_seconds = registry.register(Histogram(
+    "api_fetch_duration_seconds", "Время запроса к API синхронизации", ("on_main", "status")))
+api_fetch_bytes = registry.register(Histogram(
+    "api_fetch_bytes", "Размер ответа API синхронизации", ("on_main",), buckets=SIZE_BUCKETS))
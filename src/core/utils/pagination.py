@@ -0,0 +1,77 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from core.config import settings
+from core.utils.serialization import dumps
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """Упаковывает позицию keyset-пагинации в непрозрачную строку"""
+    raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Распаковывает курсор, выданный encode_cursor
+    Raises:
+        ValueError: если курсор поврежден или подделан
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    if not isinstance(payload, dict):
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    return payload
+
+
+def parse_limit(value: Optional[str]) -> int:
+    """Разбирает параметр limit, ограничивая его значением max_page_size"""
+    if value is None or value == "":
+        return settings.api.page_size
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f"Параметр limit должен быть целым числом, получено: {value}")
+    if limit < 1:
+        raise ValueError(f"Параметр limit должен быть положительным, получено: {value}")
+    return min(limit, settings.api.max_page_size)
+
+
+def parse_id_cursor(value: Optional[str], key: str) -> Optional[int]:
+    """Возвращает целочисленный ключ key, после которого начинается страница"""
+    if not value:
+        return None
+    after_id = decode_cursor(value).get(key)
+    if not isinstance(after_id, int) or isinstance(after_id, bool):
+        raise ValueError(f"Некорректный курсор: {value}")
+    return after_id
+
+
+def parse_product_cursor(value: Optional[str]) -> Optional[int]:
+    """Возвращает product_id, после которого начинается страница"""
+    return parse_id_cursor(value, "product_id")
+
+
+def parse_search_cursor(value: Optional[str]) -> Optional[Tuple[float, int]]:
+    """Возвращает позицию (rank, product_id), после которой начинается страница поиска"""
+    if not value:
+        return None
+    payload = decode_cursor(value)
+    rank, after_id = payload.get("rank"), payload.get("product_id")
+    if not isinstance(rank, (int, float)) or not isinstance(after_id, int) \
+            or isinstance(rank, bool) or isinstance(after_id, bool):
+        raise ValueError(f"Некорректный курсор: {value}")
+    return float(rank), after_id
+
+
+def page_envelope(items: Iterable[bytes], next_cursor: Optional[str]) -> bytes:
+    """
+    Собирает страницу {"items": [...], "next_cursor": ...} из готовых JSON-документов
+    в том же виде, что и jsonify, не разбирая сами документы
+    """
+    return b'{"items":[' + b",".join(items) + b'],"next_cursor":' + dumps(next_cursor) + b"}\n"
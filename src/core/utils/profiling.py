@@ -0,0 +1,172 @@
+"""
+Профилирование отдельного запроса или запуска синхронизации по требованию.
+
+Включается только настройкой APP_CONFIG__PROFILING__ENABLED=true и непустым токеном. Когда профилирование
+выключено, middleware и обработчики событий SQLAlchemy не устанавливаются вовсе, поэтому
+накладных расходов нет. Профилируемый запрос выбирается заголовком X-Profile: <токен> или параметром
+?profile=<токен>: он выполняется под cProfile, а отчет (top-N функций по cumulative и выполненные SQL)
+сохраняется в каталог profiling.dir. Имя файла возвращается в заголовке X-Profile-Report, а
+с ?profile_output=report отчет отдается вместо тела ответа.
+
+Одновременно выполняется только один профиль: с Python 3.12 cProfile работает через sys.monitoring,
+общий для всего процесса, поэтому второй запрос получает 409. По той же причине функции в отчете
+включают работу всех потоков процесса за время запроса, а SQL — только профилируемого потока.
+"""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Generator, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.config import settings
+from core.utils.serialization import dumps
+
+# SQL пишутся только в потоке, который сейчас профилируется
+_local = threading.local()
+# cProfile в процессе может быть включен только один
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Профилировщик уже занят другим запросом или инструментом"""
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, "statements", None) is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements = getattr(_local, "statements", None)
+    started = getattr(context, "_profile_started", None)
+    if statements is not None and started is not None:
+        statements.append((statement, time.perf_counter() - started))
+
+
+def install_sql_capture(engines: Iterable[Engine]):
+    """Подключает запись SQL к движкам; вызывается, только если профилирование включено"""
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class ProfileResult:
+    def __init__(self, title: str):
+        self.title = title
+        self.profiler = cProfile.Profile()
+        self.statements: List[Tuple[str, float]] = []
+        self.elapsed = 0.0
+
+    def report(self, top: Optional[int] = None) -> str:
+        """Текстовый отчет: top-N функций по cumulative и все SQL в порядке выполнения"""
+        stats_output = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stats_output)
+        stats.sort_stats("cumulative").print_stats(top or settings.profiling.top)
+
+        sql_seconds = sum(elapsed for _, elapsed in self.statements)
+        lines = [
+            f"Profile: {self.title}",
+            f"Total: {self.elapsed * 1000:.1f} ms, SQL: {len(self.statements)} statements, {sql_seconds * 1000:.1f} ms",
+            "",
+            stats_output.getvalue().strip(),
+            "",
+            "SQL:",
+        ]
+        lines.extend(f"  {elapsed * 1000:8.2f} ms  {' '.join(statement.split())}"
+                     for statement, elapsed in self.statements)
+        return "\n".join(lines) + "\n"
+
+    def store(self, top: Optional[int] = None) -> str:
+        """Сохраняет отчет в каталог profiling.dir и возвращает имя файла"""
+        os.makedirs(settings.profiling.dir, exist_ok=True)
+        file_name = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.txt"
+        with open(os.path.join(settings.profiling.dir, file_name), "w") as f:
+            f.write(self.report(top))
+        return file_name
+
+
+@contextmanager
+def profiled(title: str) -> Generator[ProfileResult, None, None]:
+    """
+    Выполняет блок под cProfile и собирает SQL текущего потока
+    (SQL пишутся, если для движков вызван install_sql_capture).
+    Если профилировщик уже занят, сразу выбрасывает ProfilerBusy
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("Another profile is already running")
+    result = ProfileResult(title)
+    _local.statements = result.statements
+    started = time.perf_counter()
+    try:
+        try:
+            result.profiler.enable()
+        except ValueError as error:
+            # Профилировщик процесса занят не нами (например, отладчиком)
+            raise ProfilerBusy(str(error)) from error
+        yield result
+    finally:
+        result.profiler.disable()
+        result.elapsed = time.perf_counter() - started
+        _local.statements = None
+        _profile_lock.release()
+
+
+def token_matches(value: Optional[str]) -> bool:
+    token = settings.profiling.token
+    return bool(token) and value is not None and hmac.compare_digest(value.encode(), token.encode())
+
+
+class ProfilingMiddleware:
+    """WSGI-middleware: профилирует запросы с верным токеном, остальные пропускает как есть"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        query = parse_qs(environ.get("QUERY_STRING", ""))
+        token = environ.get("HTTP_X_PROFILE") or (query.get("profile") or [None])[0]
+        if not token_matches(token):
+            return self.app(environ, start_response)
+
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured["status"], captured["headers"] = status, headers
+            return lambda data: None
+
+        title = f"{environ['REQUEST_METHOD']} {environ.get('PATH_INFO', '')}?{environ.get('QUERY_STRING', '')}"
+        try:
+            with profiled(title) as result:
+                # Тело собирается внутри профиля, чтобы учесть и потоковые ответы
+                response = self.app(environ, capture_start_response)
+                try:
+                    body = b"".join(response)
+                finally:
+                    if hasattr(response, "close"):
+                        response.close()
+        except ProfilerBusy as error:
+            body = dumps({"error": f"Profiler is busy: {error}"})
+            start_response("409 CONFLICT", [("Content-Type", "application/json"),
+                                            ("Content-Length", str(len(body)))])
+            return [body]
+        file_name = result.store()
+
+        if (query.get("profile_output") or [None])[0] == "report":
+            body = result.report().encode()
+            headers = [("Content-Type", "text/plain; charset=utf-8")]
+            status = "200 OK"
+        else:
+            headers = [(name, value) for name, value in captured["headers"] if name.lower() != "content-length"]
+            status = captured["status"]
+        headers += [("Content-Length", str(len(body))), ("X-Profile-Report", file_name)]
+        start_response(status, headers)
+        return [body]
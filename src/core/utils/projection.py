@@ -0,0 +1,68 @@
+from typing import Optional, Tuple
+
+from sqlalchemy import Select
+from sqlalchemy.orm import lazyload, load_only, selectinload
+
+from core.database.base import Product
+
+
+class Projection:
+    """
+    Подмножество полей и связей продукта, запрошенное клиентом.
+    Управляет одновременно опциями загрузки и сериализацией: связи, которые не просили,
+    не загружаются из БД и не попадают в ответ.
+    """
+
+    def __init__(self, fields: Optional[Tuple[str, ...]] = None, relations: Optional[Tuple[str, ...]] = None):
+        self.fields = fields
+        self.relations = relations
+
+    @property
+    def is_default(self) -> bool:
+        return self.fields is None and self.relations is None
+
+    def apply(self, query: Select) -> Select:
+        """Добавляет к запросу продуктов опции загрузки под проекцию"""
+        relations = Product.SERIALIZED_RELATIONS if self.relations is None else self.relations
+        options = []
+        if self.fields is not None:
+            options.append(load_only(*(getattr(Product, field) for field in self.fields)))
+        for relationship in Product.__mapper__.relationships:
+            attr = getattr(Product, relationship.key)
+            if relationship.key not in relations:
+                options.append(lazyload(attr))
+                continue
+            # Обратные связи (Category.products, ProductMark.products) объявлены как selectin
+            # и иначе подгрузили бы все продукты каждой категории и метки
+            option = selectinload(attr)
+            for back in relationship.mapper.relationships:
+                option = option.lazyload(getattr(relationship.mapper.class_, back.key))
+            options.append(option)
+        return query.options(*options)
+
+    def serialize(self, product: Product) -> dict:
+        return product.to_dict(fields=self.fields, relations=self.relations)
+
+
+def _parse_names(value: str, allowed: Tuple[str, ...], param: str) -> Tuple[str, ...]:
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Неизвестные значения параметра {param}: {', '.join(unknown)}. "
+                         f"Допустимые: {', '.join(allowed)}")
+    return names
+
+
+def parse_projection(fields: Optional[str], include: Optional[str]) -> Projection:
+    """
+    Разбирает параметры ?fields= и ?include=
+    Если задан хотя бы один из них, связи включаются только перечисленные в include.
+    Raises:
+        ValueError: при неизвестных полях или связях
+    """
+    if fields is None and include is None:
+        return Projection()
+    return Projection(
+        fields=_parse_names(fields, Product.SERIALIZED_FIELDS, "fields") if fields is not None else None,
+        relations=_parse_names(include, Product.SERIALIZED_RELATIONS, "include") if include is not None else (),
+    )
@@ -0,0 +1,71 @@
+"""
+Сериализация JSON для ответов API.
+
+Если установлен orjson, используется он, иначе стандартный json. Оба варианта дают
+одинаковый компактный вывод: UTF-8, ключи отсортированы, datetime в формате isoformat().
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson опционален
+    orjson = None
+
+
+class StdlibSerializer:
+    """Сериализатор на стандартном модуле json"""
+    name = "json"
+
+    @staticmethod
+    def _default(obj: Any):
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=self._default, ensure_ascii=False, separators=(",", ":"),
+                          sort_keys=True).encode()
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonSerializer:
+    """Сериализатор на orjson"""
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+serializer = OrjsonSerializer() if orjson is not None else StdlibSerializer()
+
+
+def dumps(obj: Any) -> bytes:
+    """Сериализует объект в компактный JSON (bytes)"""
+    return serializer.dumps(obj)
+
+
+def loads(data):
+    return serializer.loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    """JSON-провайдер Flask поверх выбранного сериализатора (используется jsonify)"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj) + b"\n", mimetype="application/json")
@@ -1,29 +1,162 @@
+import logging
+import tempfile
+import threading
+import time
 import requests
-from typing import Dict, Any, Optional
+from typing import Dict, Any, IO, Iterator, List, Optional, Tuple
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, Timeout
+from core.config import settings
+from core.utils.metrics import api_fetch_bytes, api_fetch_seconds
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - ijson опционален
+    ijson = None
+
+# Размер блока при чтении ответа API в потоковом режиме
+CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+# Предупреждение об отсутствии ijson пишется один раз за процесс, а не на каждый опрос API
+_stream_fallback_logged = threading.Event()
+
+
+class ProductStream:
+    """
+    Список products потокового ответа API: тело ответа лежит во временном файле,
+    а продукты разбираются из него пачками по batch_size при каждой итерации
+    """
+
+    def __init__(self, body: IO[bytes], count: int, batch_size: int):
+        self.body = body
+        self.count = count
+        self.batch_size = batch_size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[List[Dict[str, Any]]]:
+        self.body.seek(0)
+        batch = []
+        for product in ijson.items(self.body, "products.item", use_float=True):
+            batch.append(product)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def close(self):
+        self.body.close()
+
+
+def read_sections(body: IO[bytes]) -> Tuple[Dict[str, Any], int]:
+    """
+    Разбирает все секции верхнего уровня, кроме products, и считает продукты,
+    не собирая их в память
+    """
+    sections = {}
+    product_count = 0
+    key, builder = None, None
+    for prefix, event, value in ijson.parse(body, use_float=True):
+        if prefix == "":
+            if builder is not None:
+                sections[key] = builder.value
+                builder = None
+            if event == "map_key":
+                key = value
+                builder = None if value == "products" else ijson.ObjectBuilder()
+        elif builder is not None:
+            builder.event(event, value)
+        elif prefix == "products.item" and event == "start_map":
+            product_count += 1
+    return sections, product_count
+
+
+class FeedValidators:
+    """
+    ETag и Last-Modified ответов API, которые уже применены к БД, по URL.
+    Запоминаются только после успешной синхронизации, чтобы 304 не скрыл непримененный ответ
+    """
+
+    def __init__(self):
+        self._headers: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """Заголовки условного запроса (If-None-Match, If-Modified-Since) для URL"""
+        with self._lock:
+            return dict(self._headers.get(url, {}))
+
+    def remember(self, url: str, etag: Optional[str], last_modified: Optional[str]):
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        with self._lock:
+            self._headers[url] = headers
 
 
 class APIClient:
     """Клиент для работы с API синхронизации"""
 
-    def __init__(self, base_url: str = "https://bot-igor.ru"):
+    def __init__(self, base_url: str = "https://bot-igor.ru", session: Optional[requests.Session] = None,
+                 validators: Optional[FeedValidators] = None):
         self.base_url = base_url
+        # requests.Session не гарантирует потокобезопасность, а фиды запрашиваются параллельно, поэтому
+        # у каждого клиента своя сессия; keep-alive соединения берутся из пула общего адаптера
+        self.session = session if session is not None else pooled_session()
+        self.validators = validators if validators is not None else feed_validators
+        # Размер тела последнего ответа API в байтах
+        self.last_payload_bytes: Optional[int] = None
+        # URL, ETag и Last-Modified последнего ответа 200 (см. remember_validators)
+        self._last_response: Optional[Tuple[str, Optional[str], Optional[str]]] = None
 
-    def get_products(self, on_main: bool) -> Dict[str, Any]:
+    def get_products(self, on_main: bool, stream: Optional[bool] = None) -> Optional[Dict[str, Any]]:
         """
-        Получает данные продуктов из API
+        Получает данные продуктов из API условным запросом
         Args:
             on_main: Фильтр по флагу on_main
+            stream: Разбирать ответ потоково (по умолчанию sync.stream, если установлен ijson);
+                тогда вместо списка products возвращается ProductStream, который закрывает вызывающий
         Returns:
-            Словарь с данными от API
+            Словарь с данными от API или None, если API ответил 304 (данные не изменились)
         """
         url = f"{self.base_url}/api/products?on_main={str(on_main).lower()}"
+        label = str(on_main).lower()
+        stream = settings.sync.stream if stream is None else stream
+        if stream and ijson is None:
+            if not _stream_fallback_logged.is_set():
+                _stream_fallback_logged.set()
+                logger.warning("Потоковый разбор ответа API включен, но ijson не установлен "
+                               "(pip install ijson или poetry install --extras speedups): ответ читается целиком")
+            stream = False
+        started = time.perf_counter()
+        status = "error"
         try:
-            response = requests.get(url, timeout=10)
+            response = self.session.get(url, timeout=10, stream=stream, headers=self.validators.request_headers(url))
+            if response.status_code == 304:
+                # Пустое тело дочитывается, чтобы соединение вернулось в пул
+                response.content
+                self.last_payload_bytes = 0
+                status = "not_modified"
+                return None
             response.raise_for_status()
-            api_data = response.json()
+            self._last_response = (url, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            if stream:
+                api_data = self._read_stream(response, label)
+                status = "ok"
+            else:
+                self.last_payload_bytes = len(response.content)
+                api_fetch_bytes.observe(self.last_payload_bytes, label)
+                status = "ok"
+                api_data = response.json()
 
             if api_data.get("status") != "ok":
+                if isinstance(api_data.get("products"), ProductStream):
+                    api_data["products"].close()
                 raise ValueError(f"API вернул статус ошибки: {api_data.get('status', 'unknown')}. "
                                  f"Сообщение: {api_data.get('message', '')}")
 
@@ -33,4 +166,56 @@ class APIClient:
         except requests.exceptions.JSONDecodeError:
             raise ValueError(f"Ошибка парсинга JSON от API: некорректный ответ от {url}")
         except RequestException as e:
-            raise ConnectionError(f"Ошибка запроса к API: {str(e)}")
\ No newline at end of file
+            raise ConnectionError(f"Ошибка запроса к API: {str(e)}")
+        finally:
+            # Время запроса вместе с чтением и разбором ответа
+            api_fetch_seconds.observe(time.perf_counter() - started, label, status)
+
+    def remember_validators(self):
+        """Запомнить ETag/Last-Modified последнего ответа после того, как он применен к БД"""
+        if self._last_response is not None:
+            self.validators.remember(*self._last_response)
+
+    def _read_stream(self, response: requests.Response, label: str) -> Dict[str, Any]:
+        """
+        Пишет тело ответа во временный файл (в памяти до sync.spool_bytes) и разбирает из него
+        небольшие секции; продукты остаются в файле и читаются через ProductStream
+        """
+        body = tempfile.SpooledTemporaryFile(max_size=settings.sync.spool_bytes)
+        try:
+            size = 0
+            for chunk in response.iter_content(CHUNK_SIZE):
+                body.write(chunk)
+                size += len(chunk)
+            self.last_payload_bytes = size
+            api_fetch_bytes.observe(size, label)
+        except BaseException:
+            # Недочитанный ответ закрывается вместе с соединением; дочитанный уже вернул его в пул
+            response.close()
+            body.close()
+            raise
+
+        try:
+            body.seek(0)
+            api_data, product_count = read_sections(body)
+        except ijson.JSONError:
+            body.close()
+            raise ValueError(f"Ошибка парсинга JSON от API: некорректный ответ от {response.url}")
+        except BaseException:
+            body.close()
+            raise
+
+        api_data["products"] = ProductStream(body, product_count, settings.sync.batch_size)
+        return api_data
+
+
+def pooled_session() -> requests.Session:
+    """Новая сессия поверх общего http_adapter: его пул urllib3 потокобезопасен и живет между запусками"""
+    session = requests.Session()
+    session.mount("https://", http_adapter)
+    session.mount("http://", http_adapter)
+    return session
+
+
+http_adapter = HTTPAdapter()
+feed_validators = FeedValidators()
@@ -1,9 +1,16 @@
+from sqlalchemy import Table, or_, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from typing import TypeVar, Generic, Optional
+from typing import Any, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
 from sqlalchemy.exc import SQLAlchemyError, DataError, IntegrityError, OperationalError
 
 T = TypeVar('T')
 
+# Сколько значений передавать в одном IN (...)
+IN_BATCH_SIZE = 1000
+# Строк в одном INSERT ... ON CONFLICT: число параметров должно оставаться ниже лимита протокола (65535)
+UPSERT_BATCH_SIZE = 1000
+
 
 class Repository(Generic[T]):
     """Базовый репозиторий для операций с сущностями"""
@@ -19,6 +26,32 @@ class Repository(Generic[T]):
         except Exception as e:
             raise RuntimeError(f"Ошибка при получении сущности по ID: {str(e)}")
 
+    def get_many(self, ids: Iterable[Any], *options) -> Dict[Any, T]:
+        """Получить сущности по списку ID запросами IN (...), а не по одной"""
+        pk = self.model.__mapper__.primary_key[0]
+        return self.get_many_by(getattr(self.model, self.model.__mapper__.get_property_by_column(pk).key),
+                                ids, *options)
+
+    def get_many_by(self, column, values: Iterable[Any], *options) -> Dict[Any, T]:
+        """
+        Получить сущности по значениям уникальной колонки пачками по IN_BATCH_SIZE
+        Args:
+            column: Атрибут модели (например, ProjectParameter.description)
+            options: Опции загрузки (selectinload, lazyload и т.д.)
+        Returns:
+            Словарь значение колонки -> сущность; отсутствующих в БД значений в нем нет
+        """
+        values = list(dict.fromkeys(values))
+        found = {}
+        try:
+            for start in range(0, len(values), IN_BATCH_SIZE):
+                query = select(self.model).where(column.in_(values[start:start + IN_BATCH_SIZE])).options(*options)
+                for entity in self.session.scalars(query):
+                    found[getattr(entity, column.key)] = entity
+        except Exception as e:
+            raise RuntimeError(f"Ошибка при получении сущностей по списку значений: {str(e)}")
+        return found
+
     def add(self, entity: T) -> T:
         """Добавить новую сущность"""
         try:
@@ -50,4 +83,54 @@ class Repository(Generic[T]):
         try:
             self.session.rollback()
         except Exception as e:
-            raise RuntimeError(f"Ошибка при откате транзакции: {str(e)}")
\ No newline at end of file
+            raise RuntimeError(f"Ошибка при откате транзакции: {str(e)}")
+
+def bulk_upsert(session: Session, table: Table, rows: List[Dict[str, Any]],
+                shared: bool = False) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """
+    Вставляет или обновляет строки таблицы одним INSERT ... ON CONFLICT DO UPDATE на пачку.
+    Строка обновляется, только если хотя бы одна колонка отличается (IS DISTINCT FROM),
+    поэтому совпадающие с БД строки не переписываются и не возвращаются.
+    Прежние значения берутся из CTE того же запроса: все его части видят снимок до вставки.
+    Изменения отмечаются в ChangeTracker сессии, если он подключен.
+    Args:
+        table: Таблица с первичным ключом из одной колонки
+        rows: Значения колонок; у всех строк одинаковый набор ключей. Из повторов ключа берется последний
+        shared: Изменения затрагивают документы всех продуктов (категории, метки)
+    Returns:
+        Пары (новые значения, прежние значения) для вставленных и измененных строк;
+        у вставленных строк прежних значений нет (None)
+    """
+    if not rows:
+        return []
+    key = next(iter(table.primary_key.columns))
+    rows = list({row[key.name]: row for row in rows}.values())
+    columns = [table.c[name] for name in rows[0] if name != key.name]
+
+    changed = []
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[start:start + UPSERT_BATCH_SIZE]
+        old = select(key, *columns).where(key.in_([row[key.name] for row in batch])).cte("old")
+        upsert = insert(table).values(batch)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[key],
+            set_={column.name: upsert.excluded[column.name] for column in columns},
+            where=or_(*(column.is_distinct_from(upsert.excluded[column.name]) for column in columns)),
+        ).returning(key, *columns).cte("upserted")
+        statement = select(upsert, old).select_from(upsert.outerjoin(old, old.c[key.name] == upsert.c[key.name]))
+        for result in session.execute(statement):
+            values = dict(zip(upsert.c.keys(), result[:len(upsert.c)]))
+            previous = dict(zip(old.c.keys(), result[len(upsert.c):]))
+            existed = previous.pop(key.name) is not None
+            changed.append((values, previous if existed else None))
+
+    tracker = session.info.get("change_tracker")
+    if tracker is not None and changed:
+        added = sum(1 for _, previous in changed if previous is None)
+        tracker.mark_changed(shared=shared, added=added, updated=len(changed) - added)
+    return changed
+
+
+def changed_columns(values: Dict[str, Any], previous: Dict[str, Any]) -> List[str]:
+    """Колонки строки из bulk_upsert, значения которых изменились"""
+    return [name for name, value in previous.items() if values[name] != value]
@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from itertools import chain
+from typing import Callable, Dict, Generator, List, Optional, Set
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from core.database.base import Category, ProductMark, SyncRun
+from core.database.search import SEARCH_TEXT_ATTRIBUTES
+
+
+class SyncGeneration:
+    """
+    Номер поколения каталога.
+    Увеличивается только после синхронизации, которая действительно зафиксировала изменения в БД,
+    поэтому читатели могут кэшировать ответы, пока номер не изменился.
+    Синхронизацию может выполнить и другой процесс на той же БД, поэтому поколение сверяется с
+    версией каталога в БД (ID последней записи sync_runs с changed), см. check()
+    """
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[["ChangeTracker"], None]] = []
+        # Последняя известная процессу версия каталога в БД
+        self._version: Optional[int] = None
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def subscribe(self, callback: Callable[["ChangeTracker"], None]):
+        """Подписка на смену поколения (например, для точечной инвалидации кэшей)"""
+        self._subscribers.append(callback)
+
+    def bump(self, changes: "ChangeTracker", version: Optional[int] = None) -> int:
+        """
+        Перейти к следующему поколению и уведомить подписчиков о зафиксированных изменениях
+        Args:
+            version: Версия каталога в БД, которую создала эта синхронизация (ID ее записи sync_runs)
+        """
+        with self._lock:
+            self._value += 1
+            value = self._value
+            if version is not None and (self._version is None or version > self._version):
+                self._version = version
+        for callback in self._subscribers:
+            callback(changes)
+        return value
+
+    def check(self, session: Session) -> bool:
+        """
+        Сверяет поколение с версией каталога в БД и переходит к следующему, если каталог
+        изменила синхронизация другого процесса. Возвращает True, если поколение сменилось
+        """
+        version = session.scalar(select(func.max(SyncRun.id)).where(SyncRun.changed))
+        with self._lock:
+            if version is None or (self._version is not None and version <= self._version):
+                return False
+            self._version = version
+        self.bump(ChangeTracker.external())
+        return True
+
+
+class ChangeTracker:
+    """
+    Отслеживает, были ли в сессии зафиксированы реальные изменения.
+    Дополнительно собирает ID затронутых продуктов, ID продуктов с измененным текстом
+    для полнотекстового поиска и признак изменения общих сущностей (категорий и меток),
+    которые встраиваются в документы всех продуктов, а также число зафиксированных
+    строк по секциям синхронизации и суммарное время commit.
+    """
+
+    OPERATIONS = ("added", "updated", "deleted")
+    # Служебные атрибуты: их изменение само по себе не меняет документы каталога
+    BOOKKEEPING_ATTRIBUTES = frozenset({"content_hash"})
+
+    def __init__(self):
+        self.pending = False
+        self.committed = False
+        # Изменения сделаны другим процессом, и их состав неизвестен
+        self.is_external = False
+        self.product_ids: Set[int] = set()
+        self.search_product_ids: Set[int] = set()
+        self.shared_changed = False
+        # Текущая секция синхронизации, к которой относятся изменения следующих flush
+        self.section: Optional[str] = None
+        self.section_stats: Dict[str, Counter] = {}
+        self.commit_seconds = 0.0
+        self._pending_product_ids: Set[int] = set()
+        self._pending_search_ids: Set[int] = set()
+        self._pending_shared = False
+        # Операция для каждой строки транзакции: строка, добавленная и затем измененная, считается один раз
+        self._pending_rows: Dict[object, tuple] = {}
+        self._pending_stats: Counter = Counter()
+        self._commit_started: Optional[float] = None
+
+    @classmethod
+    def external(cls) -> "ChangeTracker":
+        """Изменения, обнаруженные по версии каталога в БД: затронутыми считаются все продукты"""
+        changes = cls()
+        changes.committed = True
+        changes.shared_changed = True
+        changes.is_external = True
+        return changes
+
+    def mark_changed(self, product_ids=(), shared: bool = False, added: int = 0, updated: int = 0, deleted: int = 0):
+        """Отметить изменения, сделанные в обход unit of work (например, Core-запросами)"""
+        self.pending = True
+        self._pending_product_ids.update(product_ids)
+        self._pending_shared = self._pending_shared or shared
+        for operation, count in zip(self.OPERATIONS, (added, updated, deleted)):
+            if count:
+                self._pending_stats[(self.section, operation)] += count
+
+    def _after_flush(self, session: Session, flush_context):
+        # Журнал запусков не относится к каталогу и не должен менять поколение
+        new = [obj for obj in session.new if not isinstance(obj, SyncRun)]
+        modified = [obj for obj in session.dirty if self._is_modified(obj)]
+        for operation, objects in zip(self.OPERATIONS, (new, modified, session.deleted)):
+            for obj in objects:
+                state = inspect(obj)
+                if operation == "deleted" or state not in self._pending_rows:
+                    self._pending_rows[state] = (self.section, operation)
+
+        for obj in chain(new, session.deleted, modified):
+            self.pending = True
+            if isinstance(obj, (Category, ProductMark)):
+                self._pending_shared = True
+            product_id = getattr(obj, "product_id", None)
+            if product_id is not None:
+                self._pending_product_ids.add(product_id)
+
+        for obj in chain(new, session.deleted):
+            if type(obj) in SEARCH_TEXT_ATTRIBUTES:
+                self._pending_search_ids.add(obj.product_id)
+        for obj in modified:
+            attributes = SEARCH_TEXT_ATTRIBUTES.get(type(obj), ())
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in attributes):
+                self._pending_search_ids.add(obj.product_id)
+
+    def _is_modified(self, obj) -> bool:
+        """Есть ли у объекта изменения, кроме служебных атрибутов"""
+        return any(attr.history.has_changes() for attr in inspect(obj).attrs
+                   if attr.key not in self.BOOKKEEPING_ATTRIBUTES)
+
+    def _before_commit(self, session: Session):
+        self._commit_started = time.perf_counter()
+
+    def _after_commit(self, session: Session):
+        if self._commit_started is not None:
+            self.commit_seconds += time.perf_counter() - self._commit_started
+            self._commit_started = None
+        if self.pending:
+            self.committed = True
+            self.product_ids |= self._pending_product_ids
+            self.search_product_ids |= self._pending_search_ids
+            self.shared_changed = self.shared_changed or self._pending_shared
+            self._pending_stats.update(self._pending_rows.values())
+            for (section, operation), count in self._pending_stats.items():
+                self.section_stats.setdefault(section, Counter())[operation] += count
+        self._reset_pending()
+
+    def _after_rollback(self, session: Session):
+        self._commit_started = None
+        self._reset_pending()
+
+    def _reset_pending(self):
+        self.pending = False
+        self._pending_product_ids = set()
+        self._pending_search_ids = set()
+        self._pending_shared = False
+        self._pending_rows = {}
+        self._pending_stats = Counter()
+
+
+@contextmanager
+def track_changes(session: Session) -> Generator[ChangeTracker, None, None]:
+    """Подключает ChangeTracker к сессии на время синхронизации"""
+    tracker = ChangeTracker()
+    listeners = [
+        ("after_flush", tracker._after_flush),
+        ("before_commit", tracker._before_commit),
+        ("after_commit", tracker._after_commit),
+        ("after_rollback", tracker._after_rollback),
+    ]
+    for name, fn in listeners:
+        event.listen(session, name, fn)
+    session.info["change_tracker"] = tracker
+    try:
+        yield tracker
+    finally:
+        session.info.pop("change_tracker", None)
+        for name, fn in listeners:
+            event.remove(session, name, fn)
+
+
+sync_generation = SyncGeneration()
@@ -1,6 +1,16 @@
+import time
+from concurrent.futures import Future
+from datetime import datetime
 from sqlalchemy.orm import Session
-from typing import List, Dict
-from core.utils.sync.core.api_client import APIClient
+from sqlalchemy.exc import SQLAlchemyError
+from typing import Any, List, Dict, Optional, Tuple
+from core.database.base import SyncRun
+from core.database.db_helper import QueryStats, track_queries
+from core.database.facets import facet_index
+from core.database.search import refresh_search_vectors
+from core.utils.metrics import sync_run_seconds, sync_section_seconds
+from core.utils.sync.core.api_client import APIClient, ProductStream
+from core.utils.sync.core.generation import sync_generation, track_changes
 from core.utils.sync.services import (
     sync_categories,
     sync_product_marks,
@@ -10,59 +20,195 @@ from core.utils.sync.services import (
     sync_special_badges,
     sync_special_json_configs
 )
-from core.utils.sync.utils.logging import setup_logger, log_sync_start, log_sync_complete
-import logging
-from datetime import datetime
+from core.utils.sync.utils.logging import sync_log_store, log_sync_start, log_sync_complete
+
+
+# Секция помечается как возможный N+1, если на каждый входной элемент приходится хотя бы
+# N_PLUS_ONE_RATIO запросов; на маленьких входах отношение неинформативно
+N_PLUS_ONE_RATIO = 1.0
+N_PLUS_ONE_MIN_ITEMS = 10
+
+
+def is_n_plus_one(stats: QueryStats, items: int) -> bool:
+    """Число запросов секции растет вместе с размером входа"""
+    return items >= N_PLUS_ONE_MIN_ITEMS and stats.count >= items * N_PLUS_ONE_RATIO
+
+
+def format_query_report(section_queries: Dict[str, tuple]) -> str:
+    """Блок отчета с числом и временем SQL-запросов по секциям"""
+    lines = ["🧮 DB queries by section:"]
+    for name, (stats, items) in section_queries.items():
+        line = f"  {name}: {stats.count} queries, {stats.seconds * 1000:.1f} ms for {items} items"
+        if is_n_plus_one(stats, items):
+            line += " 🐢 possible N+1"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def save_sync_run(session: Session, run: SyncRun, logger) -> Optional[SyncRun]:
+    """Сохраняет запись о запуске; ошибка журнала не должна ломать синхронизацию"""
+    try:
+        session.add(run)
+        session.commit()
+        return run
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.error(f"💥 Error saving sync run: {str(e)}")
+        return None
+
+
+def fetch_feed(on_main: bool) -> Tuple[APIClient, Optional[Dict[str, Any]], float]:
+    """
+    Запрашивает один фид API; безопасна для вызова из другого потока, так как не трогает сессию
+    Returns:
+        Клиент (размер ответа, валидаторы кэша), данные API или None при 304 и время запроса в мс
+    """
+    api_client = APIClient()
+    started = time.perf_counter()
+    api_data = api_client.get_products(on_main)
+    return api_client, api_data, (time.perf_counter() - started) * 1000
 
 
-def sync_api_data(session: Session, on_main: bool) -> str:
+def sync_api_data(session: Session, on_main: bool, fetched: Optional[Future] = None) -> str:
     """
     Основная функция синхронизации данных из API в БД
+    Args:
+        fetched: Уже запущенный fetch_feed(on_main) (см. scheduler.run_sync); без него фид запрашивается здесь
     """
-    logger = setup_logger("sync_logger", f"sync_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+    logger = sync_log_store.start_run("sync_logger")
     log_sync_start(logger, on_main)
+    started_at = datetime.utcnow()
+    run_started = time.perf_counter()
+    status = "ok"
+    api_data = None
+    api_fetch_ms = None
+    payload_bytes = None
+    # Сколько синхронизация ждала фид: меньше api_fetch_ms, если запрос шел параллельно с другой работой
+    wait_ms = None
+    section_errors: Dict[str, int] = {}
+    # секция -> (QueryStats, число входных элементов)
+    section_queries: Dict[str, tuple] = {}
 
-    try:
-        # Инициализация клиента API
-        api_client = APIClient()
-        api_data = api_client.get_products(on_main)
-
-        # Сбор всех функций синхронизации
-        sync_functions = [
-            ("categories", sync_categories, api_data.get("categories", [])),
-            ("product_marks", sync_product_marks, api_data.get("product_marks", [])),
-            ("products", sync_products, api_data.get("products", [])),
-            ("special_parameters", sync_special_parameters, api_data.get("special_project_parameters", {})),
-            ("special_actions", sync_special_actions, api_data.get("special_project_parameters_actions", [])),
-            ("special_badges", sync_special_badges, api_data.get("special_project_parameters_badges", [])),
-            ("special_json_configs", sync_special_json_configs, api_data.get("special_project_parameters_json", {})),
-        ]
-
-        # Выполнение синхронизации для каждого типа данных
-        reports = []
-        for name, func, data in sync_functions:
-            if not data:
-                continue
-
-            try:
-                report = func(session, data)
-                if report and "No changes" not in report:
-                    reports.append(report)
-            except Exception as e:
-                error_msg = f"💥 Error syncing {name}: {str(e)}"
-                reports.append(error_msg)
-                logger.error(error_msg)
-
-        # Формирование финального отчета
-        if not reports:
-            report = "✨ All systems green! No changes detected in the database."
-        else:
-            report = f"🔄 Data synchronization complete for on_main={on_main}:\n" + "\n\n".join(reports)
-
-        log_sync_complete(logger, report)
-        return report
-
-    except Exception as e:
-        error_msg = f"🚨 Critical error during synchronization: {str(e)}"
-        logger.critical(error_msg, exc_info=True)
-        return error_msg
\ No newline at end of file
+    with track_changes(session) as tracker:
+        try:
+            wait_started = time.perf_counter()
+            api_client, api_data, api_fetch_ms = fetched.result() if fetched is not None else fetch_feed(on_main)
+            payload_bytes = api_client.last_payload_bytes
+            wait_ms = (time.perf_counter() - wait_started) * 1000
+            apply_started = time.perf_counter()
+
+            # Ответ не изменился с последнего примененного: синхронизировать нечего
+            if api_data is None:
+                status = "not_modified"
+                report = f"✨ Feed on_main={on_main} not modified (304), sync skipped."
+                log_sync_complete(logger, report)
+                return report
+
+            # Сбор всех функций синхронизации
+            sync_functions = [
+                ("categories", sync_categories, api_data.get("categories", [])),
+                ("product_marks", sync_product_marks, api_data.get("product_marks", [])),
+                ("products", sync_products, api_data.get("products", [])),
+                ("special_parameters", sync_special_parameters, api_data.get("special_project_parameters", {})),
+                ("special_actions", sync_special_actions, api_data.get("special_project_parameters_actions", [])),
+                ("special_badges", sync_special_badges, api_data.get("special_project_parameters_badges", [])),
+                ("special_json_configs", sync_special_json_configs, api_data.get("special_project_parameters_json", {})),
+            ]
+
+            # Выполнение синхронизации для каждого типа данных
+            reports = []
+            for name, func, data in sync_functions:
+                if not data:
+                    continue
+
+                tracker.section = name
+                section_started = time.perf_counter()
+                with track_queries() as query_stats:
+                    try:
+                        report, section_errors[name] = func(session, data)
+                        if "No changes" not in report:
+                            reports.append(report)
+                    except Exception as e:
+                        # Иначе сессия в состоянии ошибки сломает следующие секции и запись sync_runs
+                        session.rollback()
+                        section_errors[name] = 1
+                        error_msg = f"💥 Error syncing {name}: {str(e)}"
+                        reports.append(error_msg)
+                        logger.error(error_msg)
+                    finally:
+                        sync_section_seconds.observe(time.perf_counter() - section_started, name)
+                section_queries[name] = (query_stats, len(data))
+            tracker.section = None
+
+            # Пересчет поискового индекса только для продуктов с измененным текстом
+            if tracker.search_product_ids:
+                try:
+                    updated = refresh_search_vectors(session, tracker.search_product_ids)
+                    session.commit()
+                    reports.append(f"🔎 Search index refreshed for {updated} products")
+                except SQLAlchemyError as e:
+                    session.rollback()
+                    error_msg = f"💥 Error refreshing search index: {str(e)}"
+                    reports.append(error_msg)
+                    logger.error(error_msg)
+
+            # Фасеты пересчитываются целиком, но только если синхронизация что-то изменила
+            if tracker.committed:
+                try:
+                    facet_index.refresh(session)
+                except SQLAlchemyError as e:
+                    session.rollback()
+                    error_msg = f"💥 Error refreshing facets: {str(e)}"
+                    reports.append(error_msg)
+                    logger.error(error_msg)
+
+            if not reports:
+                report = "✨ All systems green! No changes detected in the database."
+            else:
+                report = f"🔄 Data synchronization complete for on_main={on_main}:\n" + "\n\n".join(reports)
+            if section_queries:
+                report += "\n\n" + format_query_report(section_queries)
+            report += (f"\n\n⏱️ Feed on_main={on_main}: fetch {api_fetch_ms:.1f} ms, waited {wait_ms:.1f} ms, "
+                       f"apply {(time.perf_counter() - apply_started) * 1000:.1f} ms")
+
+            # Ответ с ошибками не запоминается, чтобы следующий опрос получил его целиком, а не 304
+            if not any(section_errors.values()):
+                api_client.remember_validators()
+
+            log_sync_complete(logger, report)
+            return report
+
+        except Exception as e:
+            status = "error"
+            error_msg = f"🚨 Critical error during synchronization: {str(e)}"
+            logger.critical(error_msg, exc_info=True)
+            return error_msg
+        finally:
+            sections = {
+                name: {**{operation: tracker.section_stats.get(name, {}).get(operation, 0)
+                          for operation in tracker.OPERATIONS}, "errors": errors,
+                       **({"queries": section_queries[name][0].count,
+                           "db_ms": section_queries[name][0].seconds * 1000,
+                           "n_plus_one": is_n_plus_one(*section_queries[name])}
+                          if name in section_queries else {})}
+                for name, errors in section_errors.items()
+            }
+            sync_run_seconds.observe(time.perf_counter() - run_started, str(on_main).lower(), status)
+            run = save_sync_run(session, SyncRun(
+                on_main=on_main,
+                started_at=started_at,
+                finished_at=datetime.utcnow(),
+                status=status,
+                changed=tracker.committed,
+                sections=sections,
+                api_fetch_ms=api_fetch_ms,
+                db_commit_ms=tracker.commit_seconds * 1000,
+                payload_bytes=payload_bytes,
+            ), logger)
+            sync_log_store.finish_run(logger)
+            # Временный файл потокового ответа API
+            if api_data is not None and isinstance(api_data.get("products"), ProductStream):
+                api_data["products"].close()
+            # Новое поколение только если что-то реально зафиксировано в БД
+            if tracker.committed:
+                sync_generation.bump(tracker, run.id if run is not None else None)
\ No newline at end of file
@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from core.config import settings
+from core.database.db_helper import db_helper
+from core.utils.sync.core.generation import sync_generation
+from core.utils.sync.main import fetch_feed, sync_api_data
+
+# Порядок применения фидов
+FEEDS = (True, False)
+
+
+def run_sync():
+    """
+    Оба фида запрашиваются параллельно, а применяются по очереди в одной сессии:
+    первый применяется, пока второй еще загружается
+    """
+    with ThreadPoolExecutor(max_workers=len(FEEDS), thread_name_prefix="api-fetch") as pool:
+        fetches = {on_main: pool.submit(fetch_feed, on_main) for on_main in FEEDS}
+        with db_helper.write_session_getter() as session:
+            for on_main in FEEDS:
+                sync_api_data(session, on_main, fetches[on_main])
+
+
+def check_generation():
+    """Переходит к новому поколению, если каталог в БД изменила синхронизация другого процесса"""
+    with db_helper.write_session_getter() as session:
+        sync_generation.check(session)
+
+
+def start_scheduler() -> BackgroundScheduler:
+    """
+    Запускает в фоновом потоке текущего процесса периодическую синхронизацию (если sync.scheduler)
+    и сверку поколения каталога с БД
+    """
+    scheduler = BackgroundScheduler()
+    if settings.sync.scheduler:
+        scheduler.add_job(run_sync, 'interval', seconds=settings.time_sleep)
+    scheduler.add_job(check_generation, 'interval', seconds=settings.sync.generation_check_ms / 1000)
+    scheduler.start()
+    return scheduler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from core.utils.profiling import install_sql_capture, profiled
+
+    parser = argparse.ArgumentParser(description="Однократный запуск синхронизации")
+    parser.add_argument("--profile", action="store_true", help="Выполнить под профилировщиком и сохранить отчет")
+    args = parser.parse_args()
+
+    if args.profile:
+        install_sql_capture([db_helper.engine])
+        with profiled("run_sync") as result:
+            run_sync()
+        print(result.report())
+        print(f"Отчет сохранен: {result.store()}")
+    else:
+        run_sync()
@@ -1,63 +1,50 @@
 from sqlalchemy.orm import Session
 from typing import List, Dict
-from core.utils.sync.core.database import Repository
+from core.utils.sync.core.database import bulk_upsert, changed_columns
 from core.database.base import Category
+from core.utils.sync.utils.logging import SectionResult, SyncReport
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DataError
-from requests.exceptions import RequestException
 
 
-def sync_categories(session: Session, categories_data: List[Dict]) -> str:
-    """Синхронизация категорий с обработкой ошибок"""
-    repo = Repository[Category](session, Category)
-    changes = []
-
+def sync_categories(session: Session, categories_data: List[Dict]) -> SectionResult:
+    """Синхронизация категорий одним INSERT ... ON CONFLICT с обработкой ошибок"""
+    changes = SyncReport()
+    rows = []
     for cat_data in categories_data:
         try:
-            cat_id = cat_data["Category_ID"]
-            existing = repo.get_by_id(cat_id)
-
-            if existing:
-                # Track changes
-                updates = []
-                if existing.category_name != cat_data["Category_Name"]:
-                    updates.append(f"name: '{existing.category_name}' → '{cat_data['Category_Name']}'")
-                    existing.category_name = cat_data["Category_Name"]
-                if existing.category_image != cat_data["Category_Image"]:
-                    updates.append(f"image URL updated")
-                    existing.category_image = cat_data["Category_Image"]
-                if existing.sort_order != cat_data["sort_order"]:
-                    updates.append(f"sort order: {existing.sort_order} → {cat_data['sort_order']}")
-                    existing.sort_order = cat_data["sort_order"]
-                if updates:
-                    changes.append(
-                        f"  📌 Category #{cat_id} '{cat_data['Category_Name']}' updated: {', '.join(updates)}")
-            else:
-                # Create new category
-                new_cat = Category(
-                    category_id=cat_id,
-                    category_name=cat_data["Category_Name"],
-                    category_image=cat_data["Category_Image"],
-                    sort_order=cat_data["sort_order"]
-                )
-                repo.add(new_cat)
-                changes.append(f"  ➕ New category #{cat_id} '{cat_data['Category_Name']}' added")
+            rows.append({
+                "category_id": cat_data["Category_ID"],
+                "category_name": cat_data["Category_Name"],
+                "category_image": cat_data["Category_Image"],
+                "sort_order": cat_data["sort_order"]
+            })
         except KeyError as e:
-            changes.append(f"  ⚠️ Пропущена категория: отсутствует поле {str(e)}")
-        except (DataError, IntegrityError) as e:
-            session.rollback()
-            changes.append(f"  ❌ Ошибка БД при обработке категории: {str(e)}")
-        except Exception as e:
-            changes.append(f"  ❓ Неизвестная ошибка при обработке категории: {str(e)}")
+            changes.error(f"  ⚠️ Пропущена категория: отсутствует поле {str(e)}")
 
     try:
-        repo.commit()
-        return f"🗂️ Categories sync complete:\n" + ("\n".join(changes) if changes else "  No changes detected")
+        for values, previous in bulk_upsert(session, Category.__table__, rows, shared=True):
+            cat_id = values["category_id"]
+            if previous is None:
+                changes.add(f"  ➕ New category #{cat_id} '{values['category_name']}' added")
+                continue
+            updates = []
+            changed = changed_columns(values, previous)
+            if "category_name" in changed:
+                updates.append(f"name: '{previous['category_name']}' → '{values['category_name']}'")
+            if "category_image" in changed:
+                updates.append(f"image URL updated")
+            if "sort_order" in changed:
+                updates.append(f"sort order: {previous['sort_order']} → {values['sort_order']}")
+            changes.add(f"  📌 Category #{cat_id} '{values['category_name']}' updated: {', '.join(updates)}")
+        session.commit()
+        report = f"🗂️ Categories sync complete:\n" + ("\n".join(changes.lines) if changes.lines else "  No changes detected")
+        return SectionResult(report, changes.errors)
     except (IntegrityError, DataError) as e:
-        repo.rollback()
-        return f"🗂️ Categories sync failed: Database error - {str(e)}"
+        session.rollback()
+        return SectionResult(f"🗂️ Categories sync failed: Database error - {str(e)}", changes.errors + 1)
     except SQLAlchemyError as e:
-        repo.rollback()
-        return f"🗂️ Categories sync failed: Database connection error - {str(e)}"
+        session.rollback()
+        return SectionResult(f"🗂️ Categories sync failed: Database connection error - {str(e)}", changes.errors + 1)
     except Exception as e:
-        repo.rollback()
-        return f"🗂️ Categories sync failed: Unexpected error - {str(e)}"
\ No newline at end of file
+        session.rollback()
+        return SectionResult(f"🗂️ Categories sync failed: Unexpected error - {str(e)}", changes.errors + 1)
@@ -1,49 +1,36 @@
 from sqlalchemy.orm import Session
 from typing import List, Dict
-from core.utils.sync.core.database import Repository
+from core.utils.sync.core.database import bulk_upsert
 from core.database.base import ProductMark
+from core.utils.sync.utils.logging import SectionResult, SyncReport
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DataError
 
 
-def sync_product_marks(session: Session, marks_data: List[Dict]) -> str:
-    """Синхронизация меток продуктов с обработкой ошибок"""
-    repo = Repository[ProductMark](session, ProductMark)
-    changes = []
-
+def sync_product_marks(session: Session, marks_data: List[Dict]) -> SectionResult:
+    """Синхронизация меток продуктов одним INSERT ... ON CONFLICT с обработкой ошибок"""
+    changes = SyncReport()
+    rows = []
     for mark_data in marks_data:
         try:
-            mark_id = mark_data["Mark_ID"]
-            existing = repo.get_by_id(mark_id)
-
-            if existing:
-                if existing.mark_name != mark_data["Mark_Name"]:
-                    old_name = existing.mark_name
-                    existing.mark_name = mark_data["Mark_Name"]
-                    changes.append(f"  🏷️ Mark #{mark_id} '{old_name}' → '{mark_data['Mark_Name']}'")
-            else:
-                new_mark = ProductMark(
-                    mark_id=mark_id,
-                    mark_name=mark_data["Mark_Name"]
-                )
-                repo.add(new_mark)
-                changes.append(f"  ➕ New mark #{mark_id} '{mark_data['Mark_Name']}' added")
+            rows.append({"mark_id": mark_data["Mark_ID"], "mark_name": mark_data["Mark_Name"]})
         except KeyError as e:
-            changes.append(f"  ⚠️ Пропущена метка: отсутствует поле {str(e)}")
-        except (DataError, IntegrityError) as e:
-            session.rollback()
-            changes.append(f"  ❌ Ошибка БД при обработке метки: {str(e)}")
-        except Exception as e:
-            changes.append(f"  ❓ Неизвестная ошибка при обработке метки: {str(e)}")
+            changes.error(f"  ⚠️ Пропущена метка: отсутствует поле {str(e)}")
 
     try:
-        repo.commit()
-        return f"🔖 Product marks sync complete:\n" + ("\n".join(changes) if changes else "  No changes detected")
+        for values, previous in bulk_upsert(session, ProductMark.__table__, rows, shared=True):
+            if previous is None:
+                changes.add(f"  ➕ New mark #{values['mark_id']} '{values['mark_name']}' added")
+            else:
+                changes.add(f"  🏷️ Mark #{values['mark_id']} '{previous['mark_name']}' → '{values['mark_name']}'")
+        session.commit()
+        report = f"🔖 Product marks sync complete:\n" + ("\n".join(changes.lines) if changes.lines else "  No changes detected")
+        return SectionResult(report, changes.errors)
     except (IntegrityError, DataError) as e:
-        repo.rollback()
-        return f"🔖 Product marks sync failed: Database error - {str(e)}"
+        session.rollback()
+        return SectionResult(f"🔖 Product marks sync failed: Database error - {str(e)}", changes.errors + 1)
     except SQLAlchemyError as e:
-        repo.rollback()
-        return f"🔖 Product marks sync failed: Database connection error - {str(e)}"
+        session.rollback()
+        return SectionResult(f"🔖 Product marks sync failed: Database connection error - {str(e)}", changes.errors + 1)
     except Exception as e:
-        repo.rollback()
-        return f"🔖 Product marks sync failed: Unexpected error - {str(e)}"
\ No newline at end of file
+        session.rollback()
+        return SectionResult(f"🔖 Product marks sync failed: Unexpected error - {str(e)}", changes.errors + 1)
@@ -1,12 +1,18 @@
 from sqlalchemy.orm import Session
-from typing import Dict, List
+from typing import Dict
 from core.database.base import Category, ProductMark, ProductColor, ProductParameter
+from core.utils.sync.utils.logging import SyncReport
 from sqlalchemy.exc import SQLAlchemyError
 
 
-def sync_product_relations(session: Session, product, prod_data: Dict) -> List[str]:
-    """Синхронизация всех связанных сущностей продукта с обработкой ошибок"""
-    changes = []
+def sync_product_relations(session: Session, product, prod_data: Dict,
+                           categories: Dict[int, Category], marks: Dict[int, ProductMark]) -> SyncReport:
+    """
+    Синхронизация всех связанных сущностей продукта с обработкой ошибок
+    Args:
+        categories, marks: Заранее загруженные категории и метки по ID; созданные здесь добавляются в них же
+    """
+    changes = SyncReport()
 
     try:
         # 1. Sync categories
@@ -17,7 +23,7 @@ def sync_product_relations(session: Session, product, prod_data: Dict) -> List[s
                 for cat_data in prod_data["categories"]:
                     try:
                         cat_id = cat_data["Category_ID"]
-                        category = session.get(Category, cat_id)
+                        category = categories.get(cat_id)
                         if not category:
                             # Create category if it doesn't exist
                             category = Category(
@@ -27,17 +33,18 @@ def sync_product_relations(session: Session, product, prod_data: Dict) -> List[s
                                 sort_order=cat_data["sort_order"]
                             )
                             session.add(category)
-                            changes.append(f"  ➕ Category #{cat_id} added for product #{product.product_id}")
+                            categories[cat_id] = category
+                            changes.add(f"  ➕ Category #{cat_id} added for product #{product.product_id}")
                         product.categories.append(category)
                     except KeyError as e:
-                        changes.append(
+                        changes.error(
                             f"    ⚠️ Пропущена категория для продукта #{product.product_id}: отсутствует поле {str(e)}")
                     except Exception as e:
-                        changes.append(
+                        changes.error(
                             f"    ❓ Ошибка при обработке категории для продукта #{product.product_id}: {str(e)}")
-                changes.append(f"  🗂️ Categories synced for product #{product.product_id}")
+                changes.add(f"  🗂️ Categories synced for product #{product.product_id}")
             except Exception as e:
-                changes.append(f"  ❌ Ошибка при синхронизации категорий для продукта #{product.product_id}: {str(e)}")
+                changes.error(f"  ❌ Ошибка при синхронизации категорий для продукта #{product.product_id}: {str(e)}")
 
         # 2. Sync marks
         if "marks" in prod_data:
@@ -47,7 +54,7 @@ def sync_product_relations(session: Session, product, prod_data: Dict) -> List[s
                 for mark_data in prod_data["marks"]:
                     try:
                         mark_id = mark_data["Mark_ID"]
-                        mark = session.get(ProductMark, mark_id)
+                        mark = marks.get(mark_id)
                         if not mark:
                             # Create mark if it doesn't exist
                             mark = ProductMark(
@@ -55,16 +62,17 @@ def sync_product_relations(session: Session, product, prod_data: Dict) -> List[s
                                 mark_name=mark_data["Mark_Name"]
                             )
                             session.add(mark)
-                            changes.append(f"  ➕ Mark #{mark_id} added for product #{product.product_id}")
+                            marks[mark_id] = mark
+                            changes.add(f"  ➕ Mark #{mark_id} added for product #{product.product_id}")
                         product.marks.append(mark)
                     except KeyError as e:
-                        changes.append(
+                        changes.error(
                             f"    ⚠️ Пропущена метка для продукта #{product.product_id}: отсутствует поле {str(e)}")
                     except Exception as e:
-                        changes.append(f"    ❓ Ошибка при обработке метки для продукта #{product.product_id}: {str(e)}")
-                changes.append(f"  🏷️ Marks synced for product #{product.product_id}")
+                        changes.error(f"    ❓ Ошибка при обработке метки для продукта #{product.product_id}: {str(e)}")
+                changes.add(f"  🏷️ Marks synced for product #{product.product_id}")
             except Exception as e:
-                changes.append(f"  ❌ Ошибка при синхронизации меток для продукта #{product.product_id}: {str(e)}")
+                changes.error(f"  ❌ Ошибка при синхронизации меток для продукта #{product.product_id}: {str(e)}")
 
         # 3. Sync colors
         if "colors" in prod_data:
@@ -77,9 +85,9 @@ def sync_product_relations(session: Session, product, prod_data: Dict) -> List[s
                     if color_id not in new_color_ids:
                         try:
                             session.delete(color)
-                            changes.append(f"  ❌ Color #{color_id} deleted from product #{product.product_id}")
+                            changes.add(f"  ❌ Color #{color_id} deleted from product #{product.product_id}")
                         except Exception as e:
-                            changes.append(f"    ❌ Ошибка при удалении цвета #{color_id}: {str(e)}")
+                            changes.error(f"    ❌ Ошибка при удалении цвета #{color_id}: {str(e)}")
 
                 # Add/update colors
                 for color_data in prod_data["colors"]:
@@ -99,7 +107,7 @@ def sync_product_relations(session: Session, product, prod_data: Dict) -> List[s
                                 updates.append(f"discount: {color.discount} → {color_data['discount']}")
                                 color.discount = color_data["discount"]
                             if updates:
-                                changes.append(f"  🎨 Color #{color_id} updated: {', '.join(updates)}")
+                                changes.add(f"  🎨 Color #{color_id} updated: {', '.join(updates)}")
                         else:
                             # Add new color
                             new_color = ProductColor(
@@ -112,14 +120,14 @@ def sync_product_relations(session: Session, product, prod_data: Dict) -> List[s
                                 product_id=product.product_id
                             )
                             product.colors.append(new_color)
-                            changes.append(f"  ➕ Color #{color_id} added to product #{product.product_id}")
+                            changes.add(f"  ➕ Color #{color_id} added to product #{product.product_id}")
                     except KeyError as e:
-                        changes.append(
+                        changes.error(
                             f"    ⚠️ Пропущен цвет для продукта #{product.product_id}: отсутствует поле {str(e)}")
                     except Exception as e:
-                        changes.append(f"    ❓ Ошибка при обработке цвета для продукта #{product.product_id}: {str(e)}")
+                        changes.error(f"    ❓ Ошибка при обработке цвета для продукта #{product.product_id}: {str(e)}")
             except Exception as e:
-                changes.append(f"  ❌ Ошибка при синхронизации цветов для продукта #{product.product_id}: {str(e)}")
+                changes.error(f"  ❌ Ошибка при синхронизации цветов для продукта #{product.product_id}: {str(e)}")
 
         # 5. Sync parameters
         if "parameters" in prod_data:
@@ -132,9 +140,9 @@ def sync_product_relations(session: Session, product, prod_data: Dict) -> List[s
                     if param_id not in new_param_ids:
                         try:
                             session.delete(existing_params[param_id])
-                            changes.append(f"  ❌ Parameter #{param_id} deleted from product #{product.product_id}")
+                            changes.add(f"  ❌ Parameter #{param_id} deleted from product #{product.product_id}")
                         except Exception as e:
-                            changes.append(f"    ❌ Ошибка при удалении параметра #{param_id}: {str(e)}")
+                            changes.error(f"    ❌ Ошибка при удалении параметра #{param_id}: {str(e)}")
 
                 # Add/update parameters
                 for param_data in prod_data["parameters"]:
@@ -155,7 +163,7 @@ def sync_product_relations(session: Session, product, prod_data: Dict) -> List[s
                                 updates.append(f"price: {param.price} → {param_data['price']}")
                                 param.price = param_data["price"]
                             if updates:
-                                changes.append(f"  🔢 Parameter #{param_id} updated: {', '.join(updates)}")
+                                changes.add(f"  🔢 Parameter #{param_id} updated: {', '.join(updates)}")
                         else:
                             # Add new parameter
                             new_param = ProductParameter(
@@ -172,17 +180,17 @@ def sync_product_relations(session: Session, product, prod_data: Dict) -> List[s
                                 product_id=product.product_id
                             )
                             product.parameters.append(new_param)
-                            changes.append(f"  ➕ Parameter #{param_id} added to product #{product.product_id}")
+                            changes.add(f"  ➕ Parameter #{param_id} added to product #{product.product_id}")
                     except KeyError as e:
-                        changes.append(
+                        changes.error(
                             f"    ⚠️ Пропущен параметр для продукта #{product.product_id}: отсутствует поле {str(e)}")
                     except Exception as e:
-                        changes.append(
+                        changes.error(
                             f"    ❓ Ошибка при обработке параметра для продукта #{product.product_id}: {str(e)}")
             except Exception as e:
-                changes.append(f"  ❌ Ошибка при синхронизации параметров для продукта #{product.product_id}: {str(e)}")
+                changes.error(f"  ❌ Ошибка при синхронизации параметров для продукта #{product.product_id}: {str(e)}")
 
     except Exception as e:
-        changes.append(f"  🚨 Критическая ошибка при синхронизации связанных сущностей: {str(e)}")
+        changes.error(f"  🚨 Критическая ошибка при синхронизации связанных сущностей: {str(e)}")
 
     return changes
\ No newline at end of file
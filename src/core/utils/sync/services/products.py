@@ -1,19 +1,108 @@
-from sqlalchemy.orm import Session
-from typing import List, Dict
+import hashlib
+import json
+from sqlalchemy import select
+from sqlalchemy.orm import Session, lazyload, selectinload
+from typing import List, Dict, Iterable, Optional, Union
 from datetime import datetime
-from core.database.base import Product
+from core.database.base import Category, Product, ProductMark
+from core.utils.sync.core.api_client import ProductStream
+from core.utils.sync.core.database import IN_BATCH_SIZE, Repository
+from core.utils.sync.utils.logging import SectionResult, SyncReport
 from .product_relations import sync_product_relations
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DataError
 
 
-def sync_products(session: Session, products_data: List[Dict]) -> str:
-    """Синхронизация продуктов с обработкой ошибок"""
-    changes = []
+def product_content_hash(prod_data: Dict) -> str:
+    """
+    Стабильный хэш продукта из API вместе со списками категорий, меток, цветов и параметров.
+    Ключи объектов сортируются; порядок элементов в списках считается частью содержимого
+    """
+    canonical = json.dumps(prod_data, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def stored_hashes(session: Session, product_ids: Iterable[int]) -> Dict[int, Optional[str]]:
+    """Сохраненные хэши продуктов без загрузки самих продуктов и их связей"""
+    product_ids = list(product_ids)
+    hashes = {}
+    for start in range(0, len(product_ids), IN_BATCH_SIZE):
+        query = select(Product.product_id, Product.content_hash).where(
+            Product.product_id.in_(product_ids[start:start + IN_BATCH_SIZE]))
+        hashes.update((product_id, content_hash) for product_id, content_hash in session.execute(query))
+    return hashes
+
+
+def _referenced_ids(products_data: List[Dict], relation: str, key: str) -> List:
+    """ID связанных сущностей (категорий, меток), упомянутых в продуктах"""
+    return [item[key] for prod_data in products_data for item in prod_data.get(relation) or [] if key in item]
+
+
+def prefetch_products(session: Session, products_data: List[Dict]) -> Dict[int, Product]:
+    """
+    Загружает все продукты пачки вместе с дочерними сущностями, которые сравниваются при синхронизации:
+    число запросов зависит от числа типов сущностей, а не от размера пачки
+    """
+    return Repository[Product](session, Product).get_many(
+        (prod_data["Product_ID"] for prod_data in products_data if "Product_ID" in prod_data),
+        selectinload(Product.categories).lazyload(Category.products),
+        selectinload(Product.marks).lazyload(ProductMark.products),
+        selectinload(Product.colors),
+        selectinload(Product.parameters),
+        # Остальные связи при синхронизации не читаются
+        lazyload(Product.excluded),
+        lazyload(Product.extras),
+        lazyload(Product.images),
+        lazyload(Product.importance_items),
+        lazyload(Product.reviews),
+        lazyload(Product.videos),
+    )
+
+
+def sync_products(session: Session, products_data: Union[List[Dict], ProductStream]) -> SectionResult:
+    """
+    Синхронизация продуктов с обработкой ошибок.
+    Продукты потокового ответа API (ProductStream) синхронизируются и фиксируются пачками,
+    поэтому в памяти одновременно находится только одна пачка
+    """
+    changes = SyncReport()
+    batches = products_data if isinstance(products_data, ProductStream) else [products_data]
+    for batch in batches:
+        failure = _sync_product_batch(session, batch, changes)
+        if failure:
+            return SectionResult(failure, changes.errors + 1)
+    report = f"🛍️ Products sync complete:\n" + ("\n".join(changes.lines) if changes.lines else "  No changes detected")
+    return SectionResult(report, changes.errors)
+
+
+def _sync_product_batch(session: Session, products_data: List[Dict], changes: SyncReport) -> Optional[str]:
+    """
+    Синхронизирует и фиксирует одну пачку продуктов, дописывая изменения в changes.
+    Сначала сравниваются хэши содержимого: продукты, хэш которых совпадает с сохраненным,
+    не загружаются и не сравниваются по полям
+    Returns:
+        Сообщение об ошибке фиксации или None
+    """
+    content_hashes = {}
+    for prod_data in products_data:
+        if "Product_ID" in prod_data:
+            content_hashes[prod_data["Product_ID"]] = product_content_hash(prod_data)
+    hashes = stored_hashes(session, content_hashes)
+    products_data = [prod_data for prod_data in products_data
+                     if "Product_ID" not in prod_data
+                     or hashes.get(prod_data["Product_ID"]) != content_hashes[prod_data["Product_ID"]]]
+    if not products_data:
+        return None
+
+    existing_products = prefetch_products(session, products_data)
+    categories = Repository[Category](session, Category).get_many(
+        _referenced_ids(products_data, "categories", "Category_ID"), lazyload(Category.products))
+    marks = Repository[ProductMark](session, ProductMark).get_many(
+        _referenced_ids(products_data, "marks", "Mark_ID"), lazyload(ProductMark.products))
 
     for prod_data in products_data:
         try:
             prod_id = prod_data["Product_ID"]
-            existing = session.get(Product, prod_id)
+            existing = existing_products.get(prod_id)
 
             # Parse dates with error handling
             created_at = None
@@ -26,7 +115,7 @@ def sync_products(session: Session, products_data: List[Dict]) -> str:
                     created_at = datetime.utcnow()
             except (KeyError, ValueError, TypeError):
                 created_at = datetime.utcnow()
-                changes.append(
+                changes.add(
                     f"  ⚠️ Неверный формат даты создания для продукта #{prod_id}, используется текущее время")
 
             try:
@@ -36,7 +125,7 @@ def sync_products(session: Session, products_data: List[Dict]) -> str:
                     updated_at = datetime.utcnow()
             except (KeyError, ValueError, TypeError):
                 updated_at = datetime.utcnow()
-                changes.append(
+                changes.add(
                     f"  ⚠️ Неверный формат даты обновления для продукта #{prod_id}, используется текущее время")
 
             if existing:
@@ -55,15 +144,17 @@ def sync_products(session: Session, products_data: List[Dict]) -> str:
                     updates.append("tags updated")
                     existing.tags = prod_data["tags"]
                 if updates:
-                    changes.append(f"📦 Product #{prod_id} updated: {', '.join(updates)}")
+                    changes.add(f"📦 Product #{prod_id} updated: {', '.join(updates)}")
 
                 # Sync related entities
                 try:
-                    product_changes = sync_product_relations(session, existing, prod_data)
-                    if product_changes:
-                        changes.extend(product_changes)
+                    product_changes = sync_product_relations(session, existing, prod_data, categories, marks)
+                    changes.extend(product_changes)
+                    # Хэш сохраняется только после полной синхронизации, иначе продукт пропускался бы и дальше
+                    if not product_changes.errors:
+                        existing.content_hash = content_hashes[prod_id]
                 except Exception as e:
-                    changes.append(
+                    changes.error(
                         f"  ❌ Ошибка при синхронизации связанных сущностей для продукта #{prod_id}: {str(e)}")
             else:
                 # Create new product
@@ -77,28 +168,30 @@ def sync_products(session: Session, products_data: List[Dict]) -> str:
                     tags=prod_data.get("tags", "")
                 )
                 session.add(new_product)
+                existing_products[prod_id] = new_product
 
                 # Sync related entities for new product
                 try:
-                    product_changes = sync_product_relations(session, new_product, prod_data)
-                    if product_changes:
-                        changes.extend(product_changes)
+                    product_changes = sync_product_relations(session, new_product, prod_data, categories, marks)
+                    changes.extend(product_changes)
+                    if not product_changes.errors:
+                        new_product.content_hash = content_hashes[prod_id]
                 except Exception as e:
-                    changes.append(
+                    changes.error(
                         f"  ❌ Ошибка при синхронизации связанных сущностей для нового продукта #{prod_id}: {str(e)}")
 
-                changes.append(f"📦 New product #{prod_id} '{prod_data['Product_Name']}' added")
+                changes.add(f"📦 New product #{prod_id} '{prod_data['Product_Name']}' added")
         except KeyError as e:
-            changes.append(f"  ⚠️ Пропущен продукт: отсутствует поле {str(e)}")
+            changes.error(f"  ⚠️ Пропущен продукт: отсутствует поле {str(e)}")
         except (DataError, IntegrityError) as e:
             session.rollback()
-            changes.append(f"  ❌ Ошибка БД при обработке продукта: {str(e)}")
+            changes.error(f"  ❌ Ошибка БД при обработке продукта: {str(e)}")
         except Exception as e:
-            changes.append(f"  ❓ Неизвестная ошибка при обработке продукта: {str(e)}")
+            changes.error(f"  ❓ Неизвестная ошибка при обработке продукта: {str(e)}")
 
     try:
         session.commit()
-        return f"🛍️ Products sync complete:\n" + ("\n".join(changes) if changes else "  No changes detected")
+        return None
     except (IntegrityError, DataError) as e:
         session.rollback()
         return f"🛍️ Products sync failed: Database error - {str(e)}"
@@ -1,53 +1,45 @@
 from sqlalchemy.orm import Session
 from typing import List, Dict
 from core.database.base import ProjectAction
+from core.utils.sync.core.database import bulk_upsert, changed_columns
+from core.utils.sync.utils.logging import SectionResult, SyncReport
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DataError
 
 
-def sync_special_actions(session: Session, actions_data: List[Dict]) -> str:
-    """Синхронизация специальных действий с обработкой ошибок"""
-    changes = []
+def sync_special_actions(session: Session, actions_data: List[Dict]) -> SectionResult:
+    """Синхронизация специальных действий одним INSERT ... ON CONFLICT с обработкой ошибок"""
+    changes = SyncReport()
+    rows = []
     for action_data in actions_data:
         try:
-            action_id = action_data["id"]
-            existing = session.get(ProjectAction, action_id)
-
-            if existing:
-                # Check for changes (simplified for brevity)
-                if existing.description != action_data["description"]:
-                    changes.append(f"  🎯 Action #{action_id} description updated")
-                    existing.description = action_data["description"]
-                # ... other fields
-            else:
-                new_action = ProjectAction(
-                    id=action_id,
-                    action_type=action_data["action_type"],
-                    description=action_data["description"],
-                    image_url=action_data["image_url"],
-                    url=action_data["url"],
-                    sort_order=action_data["sort_order"],
-                    extra_field_1=action_data["extra_field_1"],
-                    extra_field_2=action_data["extra_field_2"]
-                )
-                session.add(new_action)
-                changes.append(f"  ➕ New action #{action_id} '{action_data['description']}' added")
+            rows.append({
+                "id": action_data["id"],
+                "action_type": action_data["action_type"],
+                "description": action_data["description"],
+                "image_url": action_data["image_url"],
+                "url": action_data["url"],
+                "sort_order": action_data["sort_order"],
+                "extra_field_1": action_data["extra_field_1"],
+                "extra_field_2": action_data["extra_field_2"]
+            })
         except KeyError as e:
-            changes.append(f"  ⚠️ Пропущено действие: отсутствует поле {str(e)}")
-        except (DataError, IntegrityError) as e:
-            session.rollback()
-            changes.append(f"  ❌ Ошибка БД при обработке действия: {str(e)}")
-        except Exception as e:
-            changes.append(f"  ❓ Неизвестная ошибка при обработке действия: {str(e)}")
+            changes.error(f"  ⚠️ Пропущено действие: отсутствует поле {str(e)}")
 
     try:
+        for values, previous in bulk_upsert(session, ProjectAction.__table__, rows):
+            if previous is None:
+                changes.add(f"  ➕ New action #{values['id']} '{values['description']}' added")
+            else:
+                changes.add(f"  🎯 Action #{values['id']} {', '.join(changed_columns(values, previous))} updated")
         session.commit()
-        return f"🎯 Actions sync complete:\n" + ("\n".join(changes) if changes else "  No changes detected")
+        report = f"🎯 Actions sync complete:\n" + ("\n".join(changes.lines) if changes.lines else "  No changes detected")
+        return SectionResult(report, changes.errors)
     except (IntegrityError, DataError) as e:
         session.rollback()
-        return f"🎯 Actions sync failed: Database error - {str(e)}"
+        return SectionResult(f"🎯 Actions sync failed: Database error - {str(e)}", changes.errors + 1)
     except SQLAlchemyError as e:
         session.rollback()
-        return f"🎯 Actions sync failed: Database connection error - {str(e)}"
+        return SectionResult(f"🎯 Actions sync failed: Database connection error - {str(e)}", changes.errors + 1)
     except Exception as e:
         session.rollback()
-        return f"🎯 Actions sync failed: Unexpected error - {str(e)}"
\ No newline at end of file
+        return SectionResult(f"🎯 Actions sync failed: Unexpected error - {str(e)}", changes.errors + 1)
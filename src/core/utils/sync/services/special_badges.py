@@ -1,51 +1,43 @@
 from sqlalchemy.orm import Session
 from typing import List, Dict
 from core.database.base import ProjectBadge
+from core.utils.sync.core.database import bulk_upsert, changed_columns
+from core.utils.sync.utils.logging import SectionResult, SyncReport
 from sqlalchemy.exc import SQLAlchemyError, DataError, IntegrityError
 
 
-def sync_special_badges(session: Session, badges_data: List[Dict]) -> str:
-    """Синхронизация специальных бейджей с обработкой ошибок"""
-    changes = []
+def sync_special_badges(session: Session, badges_data: List[Dict]) -> SectionResult:
+    """Синхронизация специальных бейджей одним INSERT ... ON CONFLICT с обработкой ошибок"""
+    changes = SyncReport()
+    rows = []
     for badge_data in badges_data:
         try:
-            badge_id = badge_data["id"]
-            existing = session.get(ProjectBadge, badge_id)
-
-            if existing:
-                # Check for changes
-                if existing.description != badge_data["description"]:
-                    changes.append(f"  📌 Badge #{badge_id} description updated")
-                    existing.description = badge_data["description"]
-                # ... other fields
-            else:
-                new_badge = ProjectBadge(
-                    id=badge_id,
-                    description=badge_data["description"],
-                    image_url=badge_data["image_url"],
-                    meaning_tag=badge_data["meaning_tag"],
-                    url=badge_data["url"],
-                    sort_order=badge_data["sort_order"]
-                )
-                session.add(new_badge)
-                changes.append(f"  ➕ New badge #{badge_id} '{badge_data['description']}' added")
+            rows.append({
+                "id": badge_data["id"],
+                "description": badge_data["description"],
+                "image_url": badge_data["image_url"],
+                "meaning_tag": badge_data["meaning_tag"],
+                "url": badge_data["url"],
+                "sort_order": badge_data["sort_order"]
+            })
         except KeyError as e:
-            changes.append(f"  ⚠️ Пропущен бейдж: отсутствует поле {str(e)}")
-        except (DataError, IntegrityError) as e:
-            session.rollback()
-            changes.append(f"  ❌ Ошибка БД при обработке бейджа: {str(e)}")
-        except Exception as e:
-            changes.append(f"  ❓ Неизвестная ошибка при обработке бейджа: {str(e)}")
+            changes.error(f"  ⚠️ Пропущен бейдж: отсутствует поле {str(e)}")
 
     try:
+        for values, previous in bulk_upsert(session, ProjectBadge.__table__, rows):
+            if previous is None:
+                changes.add(f"  ➕ New badge #{values['id']} '{values['description']}' added")
+            else:
+                changes.add(f"  📌 Badge #{values['id']} {', '.join(changed_columns(values, previous))} updated")
         session.commit()
-        return f"📌 Badges sync complete:\n" + ("\n".join(changes) if changes else "  No changes detected")
+        report = f"📌 Badges sync complete:\n" + ("\n".join(changes.lines) if changes.lines else "  No changes detected")
+        return SectionResult(report, changes.errors)
     except (IntegrityError, DataError) as e:
         session.rollback()
-        return f"📌 Badges sync failed: Database error - {str(e)}"
+        return SectionResult(f"📌 Badges sync failed: Database error - {str(e)}", changes.errors + 1)
     except SQLAlchemyError as e:
         session.rollback()
-        return f"📌 Badges sync failed: Database connection error - {str(e)}"
+        return SectionResult(f"📌 Badges sync failed: Database connection error - {str(e)}", changes.errors + 1)
     except Exception as e:
         session.rollback()
-        return f"📌 Badges sync failed: Unexpected error - {str(e)}"
\ No newline at end of file
+        return SectionResult(f"📌 Badges sync failed: Unexpected error - {str(e)}", changes.errors + 1)
@@ -1,22 +1,25 @@
 from sqlalchemy.orm import Session
 from typing import Dict
-from sqlalchemy import select
 from core.database.base import ProjectJsonConfig
+from core.utils.sync.core.database import Repository
+from core.utils.sync.utils.logging import SectionResult, SyncReport
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DataError
 
 
-def sync_special_json_configs(session: Session, json_data: Dict) -> str:
+def sync_special_json_configs(session: Session, json_data: Dict) -> SectionResult:
     """Синхронизация JSON конфигураций с обработкой ошибок"""
-    changes = []
+    changes = SyncReport()
+    existing_configs = Repository[ProjectJsonConfig](session, ProjectJsonConfig).get_many_by(
+        ProjectJsonConfig.config_type, json_data.keys()
+    )
     for config_type, config_value in json_data.items():
         try:
             # Check if config exists
-            stmt = select(ProjectJsonConfig).where(ProjectJsonConfig.config_type == config_type)
-            existing = session.execute(stmt).scalar_one_or_none()
+            existing = existing_configs.get(config_type)
 
             if existing:
                 if existing.config_data != config_value:
-                    changes.append(f"  📦 JSON config '{config_type}' updated")
+                    changes.add(f"  📦 JSON config '{config_type}' updated")
                     existing.config_data = config_value
             else:
                 new_config = ProjectJsonConfig(
@@ -24,22 +27,24 @@ def sync_special_json_configs(session: Session, json_data: Dict) -> str:
                     config_data=config_value
                 )
                 session.add(new_config)
-                changes.append(f"  ➕ New JSON config '{config_type}' added")
+                existing_configs[config_type] = new_config
+                changes.add(f"  ➕ New JSON config '{config_type}' added")
         except (DataError, IntegrityError) as e:
             session.rollback()
-            changes.append(f"  ❌ Ошибка БД при обработке JSON конфига '{config_type}': {str(e)}")
+            changes.error(f"  ❌ Ошибка БД при обработке JSON конфига '{config_type}': {str(e)}")
         except Exception as e:
-            changes.append(f"  ❓ Неизвестная ошибка при обработке JSON конфига '{config_type}': {str(e)}")
+            changes.error(f"  ❓ Неизвестная ошибка при обработке JSON конфига '{config_type}': {str(e)}")
 
     try:
         session.commit()
-        return f"📦 JSON configs sync complete:\n" + ("\n".join(changes) if changes else "  No changes detected")
+        report = f"📦 JSON configs sync complete:\n" + ("\n".join(changes.lines) if changes.lines else "  No changes detected")
+        return SectionResult(report, changes.errors)
     except (IntegrityError, DataError) as e:
         session.rollback()
-        return f"📦 JSON configs sync failed: Database error - {str(e)}"
+        return SectionResult(f"📦 JSON configs sync failed: Database error - {str(e)}", changes.errors + 1)
     except SQLAlchemyError as e:
         session.rollback()
-        return f"📦 JSON configs sync failed: Database connection error - {str(e)}"
+        return SectionResult(f"📦 JSON configs sync failed: Database connection error - {str(e)}", changes.errors + 1)
     except Exception as e:
         session.rollback()
-        return f"📦 JSON configs sync failed: Unexpected error - {str(e)}"
\ No newline at end of file
+        return SectionResult(f"📦 JSON configs sync failed: Unexpected error - {str(e)}", changes.errors + 1)
\ No newline at end of file
@@ -1,13 +1,18 @@
 from sqlalchemy.orm import Session
 from typing import Dict
-from sqlalchemy import select
 from core.database.base import ProjectParameter
+from core.utils.sync.core.database import Repository
+from core.utils.sync.utils.logging import SectionResult, SyncReport
 from sqlalchemy.exc import SQLAlchemyError, DataError, IntegrityError
 
 
-def sync_special_parameters(session: Session, params_data: Dict) -> str:
+def sync_special_parameters(session: Session, params_data: Dict) -> SectionResult:
     """Синхронизация специальных параметров с обработкой ошибок"""
-    changes = []
+    changes = SyncReport()
+    # Все параметры одним запросом по описаниям (ключам без суффикса _value)
+    existing_params = Repository[ProjectParameter](session, ProjectParameter).get_many_by(
+        ProjectParameter.description, (key[:-6] for key in params_data if key.endswith("_value"))
+    )
     for key, value in params_data.items():
         try:
             if not key.endswith("_value"):
@@ -16,12 +21,11 @@ def sync_special_parameters(session: Session, params_data: Dict) -> str:
             description = params_data.get(f"{param_key}_description", "")
 
             # Check if parameter exists
-            stmt = select(ProjectParameter).where(ProjectParameter.description == param_key)
-            existing = session.execute(stmt).scalar_one_or_none()
+            existing = existing_params.get(param_key)
 
             if existing:
                 if existing.value != value:
-                    changes.append(f"  🔧 Parameter '{param_key}' updated: '{existing.value}' → '{value}'")
+                    changes.add(f"  🔧 Parameter '{param_key}' updated: '{existing.value}' → '{value}'")
                     existing.value = value
             else:
                 new_param = ProjectParameter(
@@ -29,24 +33,26 @@ def sync_special_parameters(session: Session, params_data: Dict) -> str:
                     value=value
                 )
                 session.add(new_param)
-                changes.append(f"  ➕ New parameter '{param_key}' added with value: '{value}'")
+                existing_params[param_key] = new_param
+                changes.add(f"  ➕ New parameter '{param_key}' added with value: '{value}'")
         except KeyError:
             continue  # Skip if key not found
         except (DataError, IntegrityError) as e:
             session.rollback()
-            changes.append(f"  ❌ Ошибка БД при обработке параметра '{key}': {str(e)}")
+            changes.error(f"  ❌ Ошибка БД при обработке параметра '{key}': {str(e)}")
         except Exception as e:
-            changes.append(f"  ❓ Неизвестная ошибка при обработке параметра '{key}': {str(e)}")
+            changes.error(f"  ❓ Неизвестная ошибка при обработке параметра '{key}': {str(e)}")
 
     try:
         session.commit()
-        return f"⚙️ Special parameters sync complete:\n" + ("\n".join(changes) if changes else "  No changes detected")
+        report = f"⚙️ Special parameters sync complete:\n" + ("\n".join(changes.lines) if changes.lines else "  No changes detected")
+        return SectionResult(report, changes.errors)
     except (IntegrityError, DataError) as e:
         session.rollback()
-        return f"⚙️ Special parameters sync failed: Database error - {str(e)}"
+        return SectionResult(f"⚙️ Special parameters sync failed: Database error - {str(e)}", changes.errors + 1)
     except SQLAlchemyError as e:
         session.rollback()
-        return f"⚙️ Special parameters sync failed: Database connection error - {str(e)}"
+        return SectionResult(f"⚙️ Special parameters sync failed: Database connection error - {str(e)}", changes.errors + 1)
     except Exception as e:
         session.rollback()
-        return f"⚙️ Special parameters sync failed: Unexpected error - {str(e)}"
\ No newline at end of file
+        return SectionResult(f"⚙️ Special parameters sync failed: Unexpected error - {str(e)}", changes.errors + 1)
\ No newline at end of file
@@ -1,23 +1,114 @@
 import logging
+import os
 from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
 
+from core.config import settings
 
-def setup_logger(name: str, log_file: str, level: int = logging.INFO) -> logging.Logger:
-    """Настройка логгера без дублирования обработчиков"""
-    logger = logging.getLogger(name)
+LATEST_POINTER = "latest"
 
-    # Очищаем существующие обработчики, чтобы избежать дублирования
-    if logger.handlers:
-        logger.handlers.clear()
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setFormatter(formatter)
+class SyncReport:
+    """
+    Строки отчета секции синхронизации и число ошибок в них.
+    Ошибка отмечается при записи строки, а не по ее тексту: эмодзи отчета неоднозначны
+    (❌ отмечает и удаление записи, ⚠️ — и замену неверной даты текущим временем)
+    """
 
-    logger.setLevel(level)
-    logger.addHandler(file_handler)
+    def __init__(self):
+        self.lines: List[str] = []
+        self.errors = 0
 
-    return logger
+    def add(self, line: str):
+        self.lines.append(line)
+
+    def error(self, line: str):
+        """Строка об ошибке: запись или ее часть не применена к БД"""
+        self.lines.append(line)
+        self.errors += 1
+
+    def extend(self, other: "SyncReport"):
+        self.lines.extend(other.lines)
+        self.errors += other.errors
+
+
+class SectionResult(NamedTuple):
+    """Результат сервиса синхронизации секции: текст отчета и число ошибок"""
+    report: str
+    errors: int
+
+
+class SyncLogStore:
+    """
+    Каталог логов синхронизации: по файлу на запуск, не больше retention файлов.
+    Имя последнего завершенного лога хранится в файле-указателе, поэтому поиск
+    последнего лога не зависит от числа файлов.
+    """
+
+    def __init__(self, directory: str, retention: int):
+        self.directory = directory
+        self.retention = max(retention, 1)
+
+    def start_run(self, name: str, level: int = logging.INFO) -> logging.Logger:
+        """Логгер запуска, пишущий в новый файл sync_YYYYMMDD_HHMMSS_ffffff.log"""
+        os.makedirs(self.directory, exist_ok=True)
+        log_file = os.path.join(self.directory, f"sync_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.log")
+
+        logger = logging.getLogger(name)
+        # Обработчики прошлого запуска закрываются, а не просто отцепляются, чтобы не копить дескрипторы
+        self._close_handlers(logger)
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+        logger.setLevel(level)
+        logger.addHandler(file_handler)
+        return logger
+
+    def finish_run(self, logger: logging.Logger):
+        """Закрывает файл запуска, переставляет указатель на него и удаляет логи сверх retention"""
+        log_files = [handler.baseFilename for handler in logger.handlers if isinstance(handler, logging.FileHandler)]
+        self._close_handlers(logger)
+        if not log_files:
+            return
+
+        # Атомарная замена: читатель видит либо старый, либо новый указатель
+        pointer = os.path.join(self.directory, LATEST_POINTER)
+        with open(f"{pointer}.tmp", "w") as f:
+            f.write(os.path.basename(log_files[-1]))
+        os.replace(f"{pointer}.tmp", pointer)
+        self._prune()
+
+    def latest(self) -> Optional[Tuple[str, str, str]]:
+        """
+        Последний завершенный лог синхронизации
+        Returns:
+            (путь, имя файла, ETag по имени, размеру и времени изменения) или None, если логов нет
+        """
+        try:
+            with open(os.path.join(self.directory, LATEST_POINTER)) as f:
+                log_name = f.read().strip()
+            path = os.path.join(self.directory, log_name)
+            # ETag по имени, размеру и времени изменения: для 304 файл читать не нужно
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return path, log_name, f"{log_name}-{stat.st_size}-{stat.st_mtime_ns}"
+
+    def _prune(self):
+        # Каталог ограничен retention, поэтому его просмотр дешев и идет в потоке синхронизации, а не в запросе
+        # Формат имени гарантирует, что лексикографический порядок = хронологическому
+        sync_logs = sorted(f for f in os.listdir(self.directory) if f.startswith('sync_') and f.endswith('.log'))
+        for log_name in sync_logs[:-self.retention]:
+            try:
+                os.remove(os.path.join(self.directory, log_name))
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _close_handlers(logger: logging.Logger):
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
 
 
 def log_sync_start(logger: logging.Logger, on_main: bool):
@@ -27,4 +118,7 @@ def log_sync_start(logger: logging.Logger, on_main: bool):
 
 def log_sync_complete(logger: logging.Logger, report: str):
     """Логирование завершения синхронизации"""
-    logger.info(f"Data synchronization completed. Report:\n{report}")
\ No newline at end of file
+    logger.info(f"Data synchronization completed. Report:\n{report}")
+
+
+sync_log_store = SyncLogStore(settings.log.dir, settings.log.retention)
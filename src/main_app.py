@@ -1,71 +1,387 @@
-from flask import Flask,jsonify
-import os
+import time
+
+from flask import Flask,Response,g,jsonify,request
+from typing import Dict, List, Tuple
 from sqlalchemy import select
-from apscheduler.schedulers.background import BackgroundScheduler
 
 from core.config import settings
-from core.database.base import Product
-from core.database.db_helper import db_helper
-from core.utils.sync.main import sync_api_data
+from core.database.base import Product, SyncRun
+from core.database.catalog_sql import fetch_catalog, fetch_documents, stream_documents
+from core.database.db_helper import db_helper, start_query_tracking, stop_query_tracking
+from core.database.facets import facet_index
+from core.database.search import search_products
+from core.utils.cache import AVAILABLE_ENCODINGS, catalog_cache, product_cache
+from core.utils.filters import ProductFilters, parse_filters
+from core.utils.http import (
+    best_encoding, content_etag, etag_matches, generation_etag, not_modified, parse_bool,
+)
+from core.utils.metrics import CONTENT_TYPE, http_request_seconds, registry
+from core.utils.pagination import (
+    encode_cursor, page_envelope, parse_id_cursor, parse_limit, parse_product_cursor, parse_search_cursor,
+)
+from core.utils.profiling import ProfilingMiddleware, install_sql_capture
+from core.utils.projection import Projection, parse_projection
+from core.utils.serialization import FastJSONProvider, dumps
+from core.utils.sync.core.generation import sync_generation
+from core.utils.sync.scheduler import start_scheduler
+from core.utils.sync.utils.logging import sync_log_store
 
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
+# Без включенного профилирования ни middleware, ни обработчики SQL не устанавливаются
+if settings.profiling.enabled:
+    install_sql_capture([db_helper.engine, *db_helper.replica_engines])
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app)
 
-def run_sync():
-    with db_helper.session_getter() as session:
-        sync_api_data(session, True)
-        sync_api_data(session, False)
 
-scheduler = BackgroundScheduler()
-scheduler.add_job(run_sync, 'interval', seconds=settings.time_sleep)
-scheduler.start()
+scheduler = start_scheduler()
 
-@app.route("/info")
-def info():
-    with db_helper.session_getter() as session:
-        query = (
+registry.register_pool("primary", db_helper.engine.pool)
+for number, replica_engine in enumerate(db_helper.replica_engines):
+    registry.register_pool(f"replica_{number}", replica_engine.pool)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.query_stats = start_query_tracking()
+
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    # Метка — шаблон маршрута, а не путь, чтобы число серий не зависело от ID в URL
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    http_request_seconds.observe(time.perf_counter() - g.request_started, route, request.method,
+                                 str(response.status_code))
+    if settings.api.debug_headers:
+        # Для потоковых ответов учитываются только запросы до начала передачи тела
+        response.headers["X-DB-Queries"] = str(g.query_stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{g.query_stats.seconds * 1000:.2f}"
+    return response
+
+
+@app.teardown_request
+def finish_query_tracking(exc):
+    stats = g.pop("query_stats", None)
+    if stats is not None:
+        stop_query_tracking(stats)
+
+
+@app.route("/metrics")
+def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+def build_catalog(projection: Projection = Projection(), filters: ProductFilters = ProductFilters(),
+                  session_getter=db_helper.read_session_getter) -> bytes:
+    """Строит JSON каталога (полный вариант без проекции и фильтров хранится в catalog_cache)"""
+    with session_getter() as session:
+        if settings.api.read_engine == "sql":
+            return fetch_catalog(session, projection.fields, projection.relations, filters)
+
+        query = filters.apply(projection.apply(
             select(Product)
-        )
+            .order_by(Product.product_id)
+        ))
         result = session.execute(query)
         result = result.scalars().all()
 
-        products_list = [product.to_dict() for product in result]
+        products_list = [projection.serialize(product) for product in result]
 
-        return jsonify(products_list)
+        return dumps(products_list)
 
 
-@app.route('/last_update')
-def last_update():
+def stream_catalog(projection: Projection, filters: ProductFilters):
+    """
+    Отдает каталог JSON-массивом по частям.
+    Продукты читаются пачками через серверный курсор, а карта идентичности сессии
+    держит объекты слабыми ссылками, поэтому память на запрос ограничена размером пачки.
+    """
+    with db_helper.read_session_getter() as session:
+        yield b"["
+        separator = b""
+        if settings.api.read_engine == "sql":
+            batches = stream_documents(session, settings.api.stream_batch_size, projection.fields,
+                                       projection.relations, filters)
+            for batch in batches:
+                yield separator + ",".join(batch).encode()
+                separator = b","
+            yield b"]"
+            return
+
+        query = filters.apply(projection.apply(
+            select(Product)
+            .order_by(Product.product_id)
+            .execution_options(yield_per=settings.api.stream_batch_size)
+        ))
+        for batch in session.scalars(query).partitions():
+            yield separator + b",".join(dumps(projection.serialize(product)) for product in batch)
+            separator = b","
+        yield b"]"
+
+
+def with_read_etag(response: Response, etag: str) -> Response:
+    """
+    Ставит ETag поколения ответу, прочитанному через read_session_getter. С репликами ETag не ставится:
+    реплика может отставать, и клиент сохранил бы старые данные под ETag нового поколения
+    """
+    if not db_helper.has_replicas:
+        response.set_etag(etag)
+    return response
+
+
+def catalog_snapshot_response(generation: int, etag: str) -> Response:
+    """Полный каталог из снимка поколения с заранее сжатым вариантом под Accept-Encoding"""
+    encoding = best_encoding(request.headers.get("Accept-Encoding"), AVAILABLE_ENCODINGS)
+    # У каждого варианта кодирования свой ETag
+    if encoding != "identity":
+        etag = f"{etag}-{encoding}"
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        response = not_modified(etag)
+    else:
+        # Снимок живет все поколение, поэтому строится по основной БД, а не по отстающей реплике
+        snapshot = catalog_cache.get_or_build(
+            "info", generation, lambda: build_catalog(session_getter=db_helper.write_session_getter)
+        )
+        response = Response(snapshot.encoded(encoding), mimetype="application/json")
+        response.set_etag(etag)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+@app.route("/info")
+def info():
+    # Поколение читаем до обращения к БД: ETag никогда не окажется новее данных
+    generation = sync_generation.value
+    etag = generation_etag(generation)
+    # С репликами ETag поколения есть только у снимка полного каталога, он проверяется отдельно
+    if not db_helper.has_replicas and etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
+
     try:
-        # Получаем список всех файлов в текущей директории
-        all_files = os.listdir('.')
+        stream = parse_bool(request.args.get("stream"))
+        projection = parse_projection(request.args.get("fields"), request.args.get("include"))
+        filters = parse_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        # Фильтруем только файлы логов синхронизации
-        sync_logs = [f for f in all_files if f.startswith('sync_') and f.endswith('.log')]
+    if stream:
+        response = Response(stream_catalog(projection, filters), mimetype="application/json")
+        return with_read_etag(response, etag)
 
-        if not sync_logs:
-            return jsonify({"error": "No sync logs found"}), 404
+    # Без параметров пагинации отдаем весь каталог; полный вариант берется из снимка текущего поколения
+    if "limit" not in request.args and "cursor" not in request.args:
+        if projection.is_default and filters.is_empty:
+            return catalog_snapshot_response(generation, etag)
+        response = Response(build_catalog(projection, filters), mimetype="application/json")
+        return with_read_etag(response, etag)
+
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        after_id = parse_product_cursor(request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if settings.api.read_engine == "sql":
+        with db_helper.read_session_getter() as session:
+            documents = fetch_documents(session, projection.fields, projection.relations, after_id, limit + 1,
+                                        filters=filters)
+        has_more = len(documents) > limit
+        documents = documents[:limit]
+        next_cursor = encode_cursor({"product_id": documents[-1][0]}) if has_more else None
+        # Конверт страницы собираем из готовых документов, не разбирая их
+        body = page_envelope((document.encode() for _, document in documents), next_cursor)
+        response = Response(body, mimetype="application/json")
+        return with_read_etag(response, etag)
+
+    with db_helper.read_session_getter() as session:
+        # Keyset-пагинация: берем на одну запись больше, чтобы понять, есть ли следующая страница
+        query = filters.apply(projection.apply(
+            select(Product)
+            .order_by(Product.product_id)
+            .limit(limit + 1)
+        ))
+        if after_id is not None:
+            query = query.where(Product.product_id > after_id)
+        products = session.execute(query).scalars().all()
+
+        has_more = len(products) > limit
+        products = products[:limit]
+        next_cursor = encode_cursor({"product_id": products[-1].product_id}) if has_more else None
+
+        response = jsonify({
+            "items": [projection.serialize(product) for product in products],
+            "next_cursor": next_cursor
+        })
+        return with_read_etag(response, etag)
 
-        # Сортируем файлы по имени в обратном порядке
-        # Формат sync_YYYYMMDD_HHMMSS.log гарантирует, что лексикографический порядок = хронологическому
-        sync_logs.sort(reverse=True)
 
-        # Берем самый новый файл (первый в отсортированном списке)
-        latest_log = sync_logs[0]
+@app.route("/facets")
+def facets():
+    generation = sync_generation.value
+    etag = generation_etag(generation)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
+
+    try:
+        filters = parse_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Счетчики берутся из индекса в памяти, обращение к БД нужно только для первой сборки
+    response = jsonify(facet_index.get(db_helper.write_session_getter).counts(filters))
+    response.set_etag(etag)
+    return response
+
+
+def get_product_documents(product_ids: List[int]) -> Dict[int, Tuple[bytes, str]]:
+    """
+    Возвращает документы продуктов с их ETag из product_cache, догружая промахи одним запросом
+    """
+    documents = {}
+    missing = []
+    for product_id in product_ids:
+        entry = product_cache.get(product_id)
+        if entry is None:
+            missing.append(product_id)
+        else:
+            documents[product_id] = entry
+    if not missing:
+        return documents
+
+    # Версию читаем до запроса: если синхронизация успеет инвалидировать кэш, устаревшие данные не сохранятся.
+    # Кэш заполняется из основной БД, чтобы не закрепить в нем данные отстающей реплики
+    version = product_cache.version
+    with db_helper.write_session_getter() as session:
+        if settings.api.read_engine == "sql":
+            loaded = [(product_id, document.encode())
+                      for product_id, document in fetch_documents(session, product_ids=missing)]
+        else:
+            query = Projection().apply(select(Product).where(Product.product_id.in_(missing)))
+            loaded = [(product.product_id, dumps(product.to_dict())) for product in session.scalars(query)]
+
+    for product_id, body in loaded:
+        entry = (body, content_etag(body))
+        product_cache.put(product_id, entry, version)
+        documents[product_id] = entry
+    return documents
+
+
+@app.route("/products/<int:product_id>")
+def product(product_id: int):
+    # Для попадания в кэш ETag известен без обращения к БД
+    entry = get_product_documents([product_id]).get(product_id)
+    if entry is None:
+        return jsonify({"error": f"Product #{product_id} not found"}), 404
+
+    body, etag = entry
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
+@app.route("/products")
+def products():
+    try:
+        product_ids = [int(value) for value in request.args.get("ids", "").split(",") if value.strip()]
+    except ValueError:
+        return jsonify({"error": "Параметр ids должен быть списком целых чисел через запятую"}), 400
+    if not product_ids:
+        return jsonify({"error": "Не передан параметр ids"}), 400
+    if len(product_ids) > settings.api.max_page_size:
+        return jsonify({"error": f"Можно запросить не более {settings.api.max_page_size} продуктов"}), 400
+
+    product_ids = list(dict.fromkeys(product_ids))
+    documents = get_product_documents(product_ids)
+    # Порядок ответа совпадает с порядком ids, отсутствующие продукты пропускаются
+    found = [documents[product_id] for product_id in product_ids if product_id in documents]
+    etag = content_etag("".join(etag for _, etag in found).encode())
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return not_modified(etag)
+
+    response = Response(b"[" + b",".join(body for body, _ in found) + b"]", mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
+@app.route("/search")
+def search():
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "Не передан параметр q"}), 400
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        after = parse_search_cursor(request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with db_helper.read_session_getter() as session:
+        hits = search_products(session, q, limit + 1, after)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+    next_cursor = encode_cursor({"rank": hits[-1][1], "product_id": hits[-1][0]}) if has_more else None
+
+    # Сами документы берутся из product_cache, поиск возвращает только ID и ранг
+    documents = get_product_documents([product_id for product_id, _ in hits])
+    items = (documents[product_id][0] for product_id, _ in hits if product_id in documents)
+    return Response(page_envelope(items, next_cursor), mimetype="application/json")
+
+
+@app.route("/sync/history")
+def sync_history():
+    """Журнал запусков синхронизации, новые первыми (keyset-пагинация по id)"""
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        before_id = parse_id_cursor(request.args.get("cursor"), "id")
+        on_main = parse_bool(request.args.get("on_main"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = select(SyncRun).order_by(SyncRun.id.desc()).limit(limit + 1)
+    if before_id is not None:
+        query = query.where(SyncRun.id < before_id)
+    if on_main is not None:
+        query = query.where(SyncRun.on_main == on_main)
+
+    with db_helper.read_session_getter() as session:
+        runs = session.scalars(query).all()
+        has_more = len(runs) > limit
+        runs = runs[:limit]
+        return jsonify({
+            "items": [run.to_dict() for run in runs],
+            "next_cursor": encode_cursor({"id": runs[-1].id}) if has_more else None
+        })
+
+
+@app.route('/last_update')
+def last_update():
+    try:
+        # Указатель на последний лог: время ответа не зависит от числа запусков синхронизации
+        latest = sync_log_store.latest()
+        if latest is None:
+            return jsonify({"error": "No sync logs found"}), 404
+
+        log_path, latest_log, etag = latest
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return not_modified(etag)
 
         # Читаем содержимое файла
-        with open(latest_log, 'r') as f:
+        with open(log_path, 'r') as f:
             log_content = f.read()
 
         # Возвращаем информацию о логе
-        return jsonify({
+        response = jsonify({
             "log_file": latest_log,
-            "timestamp": latest_log[5:19],  # Извлекаем временную метку из имени файла
+            "timestamp": latest_log[5:20],  # Извлекаем временную метку из имени файла
             "content": log_content
         })
+        response.set_etag(etag)
+        return response
 
     except Exception as e:
         return jsonify({"error": f"Failed to read logs: {str(e)}"}), 500
-
-
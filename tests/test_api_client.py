@@ -0,0 +1,138 @@
+"""APIClient против локальной заглушки API на http.server: keep-alive, условные запросы и 304"""
+import json
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from core.database.base import SyncRun
+from core.utils.sync import main as sync_main
+from core.utils.sync.core.api_client import APIClient, FeedValidators, ijson
+
+FEED = {
+    "status": "ok",
+    "categories": [{"Category_ID": 1, "Category_Name": "Phones"}],
+    "products": [{"Product_ID": 1, "Product_Name": "Phone"}, {"Product_ID": 2, "Product_Name": "Case"}],
+}
+ETAG = '"feed-1"'
+
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps(FEED).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPIHandler)
+    server.connections = 0
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def api_client(stub_api):
+    session = requests.Session()
+    client = APIClient(f"http://127.0.0.1:{stub_api.server_address[1]}", session=session,
+                       validators=FeedValidators())
+    yield client
+    session.close()
+
+
+STREAM_MODES = [False, pytest.param(True, marks=pytest.mark.skipif(ijson is None, reason="ijson не установлен"))]
+
+
+@pytest.mark.parametrize("stream", STREAM_MODES)
+def test_connection_is_reused(stub_api, api_client, stream):
+    for on_main in (True, False, True):
+        products = api_client.get_products(on_main, stream=stream)["products"]
+        if stream:
+            # ProductStream отдает продукты пачками
+            products, stream_products = [product for batch in products for product in batch], products
+            stream_products.close()
+        assert [product["Product_ID"] for product in products] == [1, 2]
+
+    assert len(stub_api.requests) == 3
+    assert stub_api.connections == 1
+
+
+def test_clients_share_connection_pool(stub_api):
+    base_url = f"http://127.0.0.1:{stub_api.server_address[1]}"
+    # Каждый клиент со своей сессией (как в потоках api-fetch), но соединения общие
+    for on_main in (True, False, True):
+        client = APIClient(base_url, validators=FeedValidators())
+        assert client.get_products(on_main, stream=False) is not None
+
+    assert len(stub_api.requests) == 3
+    assert stub_api.connections == 1
+
+
+@pytest.mark.parametrize("stream", STREAM_MODES)
+def test_not_modified_returns_none(stub_api, api_client, stream):
+    assert api_client.get_products(True, stream=stream) is not None
+    # Валидаторы запоминаются только после применения ответа
+    assert api_client.get_products(True, stream=stream) is not None
+    api_client.remember_validators()
+
+    assert api_client.get_products(True, stream=stream) is None
+    assert api_client.last_payload_bytes == 0
+    assert stub_api.connections == 1
+
+
+@pytest.fixture
+def sync_runs_session():
+    engine = create_engine("sqlite://")
+    SyncRun.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def test_sync_skips_sections_when_not_modified(api_client, sync_runs_session, monkeypatch, tmp_path):
+    monkeypatch.setattr(sync_main.sync_log_store, "directory", str(tmp_path))
+    called = []
+    for name in ("sync_categories", "sync_product_marks", "sync_products", "sync_special_parameters",
+                 "sync_special_actions", "sync_special_badges", "sync_special_json_configs"):
+        monkeypatch.setattr(sync_main, name, lambda session, data, name=name: called.append(name))
+
+    api_client.get_products(True, stream=False)
+    api_client.remember_validators()
+    fetched = Future()
+    fetched.set_result((api_client, api_client.get_products(True, stream=False), 1.0))
+
+    report = sync_main.sync_api_data(sync_runs_session, True, fetched)
+
+    assert "not modified" in report
+    assert called == []
+    run = sync_runs_session.execute(select(SyncRun)).scalar_one()
+    assert (run.status, run.changed, run.sections, run.payload_bytes) == ("not_modified", False, {}, 0)